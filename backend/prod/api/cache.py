@@ -0,0 +1,165 @@
+# backend/prod/api/cache.py
+
+from collections import OrderedDict
+from fastapi import Request, Response, status
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .serialization import json_response
+from .settings import settings
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+import threading
+
+# Cantidad máxima de respuestas en caché (0 la desactiva)
+RESPONSE_CACHE_SIZE = settings.response_cache_size
+
+# Clave de `Session.info` con las entidades modificadas aún sin confirmar
+PENDING_KEY = "response_cache_invalidations"
+
+
+class CacheLookup(NamedTuple):
+    key: str
+    dependencies: Tuple[str, ...]
+    versions: Tuple[int, ...]
+
+
+class ResponseCache:
+    """
+    Caché LRU en memoria de respuestas ya serializadas. Cada respuesta se
+    guarda con la versión de las entidades de las que depende (p. ej.
+    `horses` o `horse:3`); al modificarse una entidad se incrementa su
+    versión y las respuestas que dependen de ella dejan de servirse.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _current(self, dependencies: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._versions.get(dependency, 0) for dependency in dependencies)
+
+    def lookup(
+        self, request: Request, dependencies: Tuple[str, ...]
+    ) -> Tuple[Optional[Response], CacheLookup]:
+        """
+        Busca la respuesta de `request`. Devuelve la respuesta en caché (o un
+        304 si coincide `If-None-Match`) y los datos para guardarla luego; las
+        versiones se toman antes de consultar la base, de modo que una
+        escritura concurrente invalida lo que se guarde después.
+        """
+        key = f"{request.url.path}?{request.url.query}"
+        with self._lock:
+            versions = self._current(dependencies)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                if entry is not None:
+                    del self._entries[key]
+                entry = None
+                self.misses += 1
+        lookup = CacheLookup(key, dependencies, versions)
+        if entry is None:
+            return None, lookup
+        _, content, headers = entry
+        etag = headers.get("etag")
+        if etag and etag in (
+            tag.strip() for tag in request.headers.get("if-none-match", "").split(",")
+        ):
+            return (
+                Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers),
+                lookup,
+            )
+        return json_response(content, headers), lookup
+
+    def store(self, lookup: CacheLookup, content: bytes, headers) -> Response:
+        response = json_response(content, headers)
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[lookup.key] = (
+                    lookup.versions,
+                    content,
+                    {
+                        name: value
+                        for name, value in response.headers.items()
+                        if name not in ("content-length", "content-type")
+                    },
+                )
+                self._entries.move_to_end(lookup.key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return response
+
+    def bump(self, dependencies: Iterable[str]) -> None:
+        with self._lock:
+            for dependency in dependencies:
+                self._versions[dependency] = self._versions.get(dependency, 0) + 1
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE)
+
+
+# ----------------------
+# Invalidación por escrituras
+# ----------------------
+
+
+def invalidate(
+    session: Session,
+    horses: Iterable[int] = (),
+    users: Iterable[Optional[int]] = (),
+    horse_rows: Iterable[Optional[int]] = (),
+) -> None:
+    """
+    Registra las entidades modificadas por la transacción en curso; sus
+    versiones se incrementan recién cuando la transacción se confirma.
+
+    `horses` son caballos cuyo detalle cambió (compradores, cuotas o
+    transacciones); `horse_rows` y `users`, caballos y usuarios cuya propia
+    fila cambió, lo que invalida también el listado. Un ID None (alta aún
+    sin ID) invalida sólo el listado.
+    """
+    pending = session.info.setdefault(PENDING_KEY, set())
+    pending.update(f"horse:{horse_id}" for horse_id in horses)
+    for listing, prefix, ids in (
+        ("horses", "horse", horse_rows),
+        ("users", "user", users),
+    ):
+        for id_ in ids:
+            pending.add(listing)
+            if id_ is not None:
+                pending.add(f"{prefix}:{id_}")
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed(session: Session) -> None:
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        response_cache.bump(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
@@ -1,13 +1,17 @@
 # backend/prod/api/crud.py
 
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import Optional, List, Dict
+from sqlalchemy.orm import Session, aliased, noload, selectinload
+from sqlalchemy import and_, or_, func, insert, select, update, case, literal, tuple_
+from typing import Optional, List, Dict, Set
 from . import schemas
+from .cache import invalidate
+from .serialization import schema_columns, schema_rows
 from .models import *
 from fastapi import HTTPException
 from datetime import datetime, timedelta
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+import base64
+import json
 import logging
 
 # Configuración del logger
@@ -21,6 +25,11 @@ logger = logging.getLogger(__name__)
 def commit_session(session: Session):
     try:
         session.commit()
+    except IntegrityError as e:
+        # Referencias inexistentes (claves foráneas) o restricciones violadas
+        session.rollback()
+        logger.error(f"Integrity error: {str(e.orig)}")
+        raise HTTPException(status_code=400, detail=f"Datos inválidos: {str(e.orig)}")
     except SQLAlchemyError as e:
         session.rollback()
         logger.error(f"Database error: {str(e)}")
@@ -34,7 +43,135 @@ def add_and_refresh(session: Session, instance):
     return instance
 
 
-from datetime import datetime, timedelta
+# ----------------------
+# Paginación por Cursor
+# ----------------------
+
+
+def encode_cursor(values) -> str:
+    """
+    Codifica los valores de ordenamiento de la última fila de una página en
+    un cursor opaco.
+    """
+    payload = json.dumps(
+        [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in values
+        ]
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("Cursor inválido")
+        return [
+            (
+                datetime.fromisoformat(value)
+                if isinstance(column.type, DateTime)
+                else value
+            )
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def paginate(
+    query, order_by: list, skip: int = 0, limit: int = 100, after: Optional[str] = None
+) -> list:
+    """
+    Pagina `query` ordenada por `order_by`. Con `after` usa paginación por
+    cursor (keyset): el costo no depende de la profundidad de la página.
+    Sin cursor mantiene el comportamiento de `skip`/`limit`.
+    """
+    query = query.order_by(*order_by)
+    if after:
+        values = decode_cursor(after, order_by)
+        query = query.filter(
+            tuple_(*order_by)
+            > tuple_(
+                *(
+                    literal(value, column.type)
+                    for column, value in zip(order_by, values)
+                )
+            )
+        )
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+
+def get_table_version(db: Session, *models) -> tuple:
+    """
+    Versión de las tablas de `models`: la última modificación (`updated_at`)
+    y la cantidad de filas de cada una, en una sola consulta de agregados.
+    Cambia ante cualquier alta, baja o modificación de esas tablas.
+    """
+    return tuple(
+        db.execute(
+            select(
+                *(
+                    aggregate
+                    for model in models
+                    for aggregate in (
+                        select(func.max(model.updated_at)).scalar_subquery(),
+                        select(func.count(model.id)).scalar_subquery(),
+                    )
+                )
+            )
+        ).one()
+    )
+
+
+def get_by_ids(
+    db: Session, model, ids: List[int], columns: Optional[list] = None
+) -> list:
+    """
+    Obtiene las filas de `model` con los `ids` dados en una sola consulta IN,
+    en el orden pedido. Los IDs inexistentes se omiten. Con `columns`
+    devuelve sólo esas columnas, sin crear objetos ORM.
+    """
+    query = db.query(*columns) if columns else db.query(model)
+    by_id = {row.id: row for row in query.filter(model.id.in_(set(ids)))}
+    return [by_id[id_] for id_ in dict.fromkeys(ids) if id_ in by_id]
+
+
+# ----------------------
+# Nombres para Mostrar
+# ----------------------
+
+
+def _query_with_names(db: Session, model):
+    """
+    Consulta `model` (HorseBuyer o Transaction) junto con el nombre del
+    usuario y del caballo relacionados, con OUTER JOINs en la misma sentencia.
+    """
+    user_id = HorseBuyer.buyer_id if model is HorseBuyer else Transaction.user_id
+    return (
+        db.query(model, User.name, Horse.name)
+        .outerjoin(User, User.id == user_id)
+        .outerjoin(Horse, Horse.id == model.horse_id)
+    )
+
+
+def _with_display_names(rows) -> list:
+    """
+    Copia a cada objeto los nombres de las filas (objeto, usuario, caballo)
+    devueltas por `_query_with_names`.
+    """
+    objects = []
+    for obj, user_name, horse_name in rows:
+        if isinstance(obj, HorseBuyer):
+            obj.buyer_name = user_name
+        else:
+            obj.user_name = user_name
+        obj.horse_name = horse_name
+        objects.append(obj)
+    return objects
 
 
 def calculate_due_date(
@@ -65,41 +202,95 @@ def update_installment_status(buyer_installment: BuyerInstallment):
         buyer_installment.status = PaymentStatus.PENDING
 
 
-def _create_installments_for_horse(horse: Horse, db: Session) -> None:
+def _build_installment_schedule(horse: Horse) -> List[dict]:
+    """
+    Genera en memoria las filas de `installments` de un caballo.
+    """
+    installment_amount = horse.total_value / horse.number_of_installments
+    schedule = []
+    for i in range(1, horse.number_of_installments + 1):
+        due_date = calculate_due_date(
+            horse.creation_date, i, horse.starting_billing_month
+        )
+        schedule.append(
+            {
+                "horse_id": horse.id,
+                "due_date": due_date,
+                "amount": installment_amount,
+                "installment_number": i,
+                "mes": due_date.month,
+                "año": due_date.year,
+            }
+        )
+    return schedule
+
+
+def _build_buyer_installments(
+    installments: List[tuple], horse_buyers: List[HorseBuyer]
+) -> List[dict]:
+    """
+    Genera en memoria las filas de `buyer_installments` para cada par
+    (cuota, comprador). `installments` son tuplas (id, amount).
+    """
+    return [
+        {
+            "horse_buyer_id": horse_buyer.id,
+            "installment_id": installment_id,
+            "amount": amount * (horse_buyer.percentage / 100),
+            "amount_paid": 0.0,
+            "status": PaymentStatus.PENDING,
+        }
+        for installment_id, amount in installments
+        for horse_buyer in horse_buyers
+    ]
+
+
+def _create_installments_for_horses(horses: List[Horse], db: Session) -> None:
+    """
+    Crea el calendario completo de cuotas de uno o varios caballos con dos
+    inserciones masivas (executemany) en lugar de una fila ORM por cuota y
+    comprador.
+    """
     try:
-        for i in range(1, horse.number_of_installments + 1):
-            due_date = calculate_due_date(
-                horse.creation_date, i, horse.starting_billing_month
-            )
-            installment = Installment(
-                horse_id=horse.id,
-                due_date=due_date,
-                amount=horse.total_value / horse.number_of_installments,
-                installment_number=i,
-                mes=due_date.month,
-                año=due_date.year,
+        # Asegura que los caballos y sus compradores tengan ID
+        db.flush()
+        schedule = [
+            row for horse in horses for row in _build_installment_schedule(horse)
+        ]
+        if not schedule:
+            return
+        db.execute(insert(Installment), schedule)
+        installments_by_horse = {horse.id: [] for horse in horses}
+        for horse_id, installment_id, amount in db.execute(
+            select(Installment.horse_id, Installment.id, Installment.amount)
+            .where(Installment.horse_id.in_(installments_by_horse))
+            .order_by(Installment.horse_id, Installment.installment_number)
+        ):
+            installments_by_horse[horse_id].append((installment_id, amount))
+        # En modo lazy las cuotas de compradores no se materializan
+        buyer_installments = [
+            row
+            for horse in horses
+            if not horse.lazy_installments
+            for row in _build_buyer_installments(
+                installments_by_horse[horse.id], horse.buyers
             )
-            db.add(installment)
-            db.flush()
-
-            for horse_buyer in horse.buyers:
-                buyer_amount = (horse.total_value / horse.number_of_installments) * (
-                    horse_buyer.percentage / 100
-                )
-                buyer_installment = BuyerInstallment(
-                    horse_buyer_id=horse_buyer.id,
-                    installment_id=installment.id,
-                    amount=buyer_amount,
-                    amount_paid=0.0,
-                    status=PaymentStatus.PENDING,
-                )
-                db.add(buyer_installment)
-        logger.debug(f"Installments created for Horse ID {horse.id}")
+        ]
+        if buyer_installments:
+            db.execute(insert(BuyerInstallment), buyer_installments)
+        logger.debug(
+            f"Installments created for Horse IDs {list(installments_by_horse)}: "
+            f"{len(schedule)} cuotas, {len(buyer_installments)} cuotas de compradores"
+        )
     except SQLAlchemyError as e:
         logger.error(f"Error al crear cuotas: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al crear cuotas: {str(e)}")
 
 
+def _create_installments_for_horse(horse: Horse, db: Session) -> None:
+    _create_installments_for_horses([horse], db)
+
+
 def create_horse_with_buyers(db: Session, **horse_data) -> Horse:
     """
     Crea un caballo con sus compradores y cuotas iniciales.
@@ -153,6 +344,7 @@ def _create_horse_with_buyers(
                 total_percentage=total_percentage,
                 information=information,
                 image_url=image_url,
+                lazy_installments=LAZY_INSTALLMENTS,
             )
             session.add(horse)
             session.flush()
@@ -168,6 +360,7 @@ def _create_horse_with_buyers(
 
             # Crear cuotas
             _create_installments_for_horse(horse, session)
+            invalidate(session, horse_rows=[horse.id])
 
         session.refresh(horse)
         logger.debug(f"Horse creado con ID {horse.id}")
@@ -182,44 +375,113 @@ def _create_horse_with_buyers(
         raise HTTPException(status_code=400, detail=str(ve))
 
 
-def distribute_prize(transaction: Transaction, session: Session):
-    horse = transaction.horse
-    logger.debug(f"Distributing prize for horse {horse.id} among buyers.")
-    for horse_buyer in horse.buyers:
-        buyer_amount = transaction.total_amount * (horse_buyer.percentage / 100)
-        horse_buyer.buyer.balance += buyer_amount
-        logger.debug(
-            f"Updated balance for buyer {horse_buyer.buyer_id}: {horse_buyer.balance}"
+def create_horses_bulk(db: Session, horses_data: List[dict]) -> List[dict]:
+    """
+    Crea muchos caballos con sus compradores y cuotas en una sola transacción.
+
+    Las validaciones se hacen en una pasada: porcentajes de cada caballo,
+    y existencia de todos los compradores con una única consulta. Los
+    caballos inválidos se informan por ítem y no impiden crear el resto.
+    """
+    results = []
+    buyer_ids = {
+        buyer["buyer_id"]
+        for horse_data in horses_data
+        for buyer in horse_data.get("buyers_data") or []
+        if "buyer_id" in buyer
+    }
+    try:
+        with db.begin():
+            existing_ids = {
+                user_id
+                for (user_id,) in db.query(User.id).filter(User.id.in_(buyer_ids))
+            }
+            creation_date = datetime.utcnow()
+            created = []
+            for index, horse_data in enumerate(horses_data):
+                result = {
+                    "index": index,
+                    "name": horse_data.get("name"),
+                    "success": False,
+                }
+                results.append(result)
+                buyers_data = horse_data.get("buyers_data") or []
+                try:
+                    validate_horse_buyers(buyers_data)
+                    horse_buyer_ids = [buyer["buyer_id"] for buyer in buyers_data]
+                    missing = sorted(set(horse_buyer_ids) - existing_ids)
+                    if missing:
+                        raise ValueError(f"Compradores no encontrados: {missing}")
+                    horse = Horse(
+                        starting_billing_month=horse_data.get("starting_billing_month"),
+                        name=horse_data.get("name"),
+                        total_value=horse_data.get("total_value"),
+                        number_of_installments=horse_data.get("number_of_installments"),
+                        total_percentage=sum(b["percentage"] for b in buyers_data),
+                        information=horse_data.get("information"),
+                        image_url=horse_data.get("image_url"),
+                        creation_date=creation_date,
+                        lazy_installments=LAZY_INSTALLMENTS,
+                    )
+                    horse.buyers = [
+                        HorseBuyer(
+                            buyer_id=buyer["buyer_id"], percentage=buyer["percentage"]
+                        )
+                        for buyer in buyers_data
+                    ]
+                except (ValueError, AssertionError, KeyError) as e:
+                    result["error"] = str(e) or "Datos inválidos"
+                    continue
+                db.add(horse)
+                created.append((result, horse))
+
+            _create_installments_for_horses([horse for _, horse in created], db)
+            invalidate(db, horse_rows=[horse.id for _, horse in created])
+            for result, horse in created:
+                result["success"] = True
+                result["horse_id"] = horse.id
+        logger.debug(f"Alta masiva: {len(created)} de {len(horses_data)} caballos")
+        return results
+    except SQLAlchemyError as e:
+        logger.error(f"Error en alta masiva de caballos: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail="Error en el alta masiva de caballos"
         )
-    commit_session(session)
-    for horse_buyer in horse.buyers:
-        user = horse_buyer.buyer
-        user.update_total_balance()
+
+
+def distribute_prize(transaction: Transaction, session: Session):
+    logger.debug(f"Distributing prize for horse {transaction.horse_id} among buyers.")
+    distribute_among_buyers(
+        session,
+        horse_id=transaction.horse_id,
+        amount=transaction.total_amount,
+        transaction_id=transaction.id,
+        concept=transaction.concept or TransactionType.PREMIO.value,
+    )
     commit_session(session)
 
 
 def distribute_expense(transaction: Transaction, session: Session):
-    horse = transaction.horse
-    logger.debug(f"Distributing expense for horse {horse.id} among buyers.")
-    for horse_buyer in horse.buyers:
-        expense_amount = transaction.total_amount * (horse_buyer.percentage / 100)
-        horse_buyer.buyer.balance -= expense_amount
-        logger.debug(
-            f"Deducted {expense_amount} from buyer {horse_buyer.buyer_id}, new balance: {horse_buyer.balance}"
-        )
-    commit_session(session)
-    for horse_buyer in horse.buyers:
-        user = horse_buyer.buyer
-        user.update_total_balance()
+    logger.debug(f"Distributing expense for horse {transaction.horse_id} among buyers.")
+    distribute_among_buyers(
+        session,
+        horse_id=transaction.horse_id,
+        amount=-transaction.total_amount,
+        transaction_id=transaction.id,
+        concept=transaction.concept,
+    )
     commit_session(session)
 
 
 def distribute_income_payment(transaction: Transaction, session: Session):
-    user_tt = transaction.user
-    user_tt.balance += transaction.total_amount
-    logger.debug(
-        f"Updated user balance for user {user_tt.id}: {user_tt.balance}, total: {transaction.total_amount}"
+    record_balance_entry(
+        session,
+        user_id=transaction.user_id,
+        amount=transaction.total_amount,
+        transaction_id=transaction.id,
+        concept=transaction.concept,
     )
+    logger.debug(f"Credited {transaction.total_amount} to user {transaction.user_id}")
     commit_session(session)
 
 
@@ -238,7 +500,8 @@ def get_pending_buyer_installments(horse: Horse, session: Session):
         .join(Installment)
         .filter(
             Installment.horse_id == horse.id,
-            BuyerInstallment.status != PaymentStatus.PAID,
+            BuyerInstallment.status
+            != BuyerInstallment.status_literal(PaymentStatus.PAID),
         )
         .all()
     )
@@ -264,27 +527,115 @@ def process_transaction(transaction: Transaction, session: Session):
         raise HTTPException(status_code=400, detail=str(ve))
 
 
-def recalculate_installments(db: Session, horse: Horse) -> None:
+def recalculate_installments(
+    db: Session, horse: Horse, previous_percentages: Optional[Dict[int, float]] = None
+) -> None:
+    """
+    Ajusta incrementalmente las cuotas de los compradores de un caballo.
+
+    `previous_percentages` mapea el ID de cada HorseBuyer existente a su
+    porcentaje anterior. Sólo se tocan las filas cuyo reparto cambió:
+    se insertan las de compradores nuevos, se actualiza el monto de los que
+    cambiaron de porcentaje y se eliminan las de compradores removidos.
+    `last_payment_date` y los pagos asociados se conservan; `amount_paid` se
+    limita al nuevo monto, el excedente se acredita en el libro mayor y el
+    estado se recalcula.
+    Si no se indica `previous_percentages` se recalculan todos los montos.
+    En caballos con cuotas lazy sólo se ajustan las filas ya materializadas.
+    """
     try:
-        installments = (
-            db.query(Installment).filter(Installment.horse_id == horse.id).all()
+        installment_ids = select(Installment.id).where(Installment.horse_id == horse.id)
+        current_ids = [horse_buyer.id for horse_buyer in horse.buyers]
+
+        # Compradores removidos
+        deleted = (
+            db.query(BuyerInstallment)
+            .filter(
+                BuyerInstallment.installment_id.in_(installment_ids),
+                BuyerInstallment.horse_buyer_id.notin_(current_ids),
+            )
+            .delete(synchronize_session=False)
         )
-        for installment in installments:
-            db.query(BuyerInstallment).filter(
-                BuyerInstallment.installment_id == installment.id
-            ).delete(synchronize_session=False)
-            for horse_buyer in horse.buyers:
-                buyer_amount = installment.amount * (horse_buyer.percentage / 100)
-                buyer_installment = BuyerInstallment(
+
+        # Compradores nuevos (sin cuotas todavía)
+        with_installments = {
+            horse_buyer_id
+            for (horse_buyer_id,) in db.query(BuyerInstallment.horse_buyer_id)
+            .filter(BuyerInstallment.horse_buyer_id.in_(current_ids))
+            .distinct()
+        }
+        new_buyers = [hb for hb in horse.buyers if hb.id not in with_installments]
+        inserted = 0
+        if new_buyers and not horse.lazy_installments:
+            installments = db.execute(
+                select(Installment.id, Installment.amount)
+                .where(Installment.horse_id == horse.id)
+                .order_by(Installment.installment_number)
+            ).all()
+            rows = _build_buyer_installments(installments, new_buyers)
+            if rows:
+                db.execute(insert(BuyerInstallment), rows)
+            inserted = len(rows)
+
+        # Compradores cuyo porcentaje cambió
+        changed_buyers = [
+            hb
+            for hb in horse.buyers
+            if hb.id in with_installments
+            and (
+                previous_percentages is None
+                or previous_percentages.get(hb.id) != hb.percentage
+            )
+        ]
+        updated = 0
+        for horse_buyer in changed_buyers:
+            new_amount = select(Installment.amount).where(
+                Installment.id == BuyerInstallment.installment_id
+            ).scalar_subquery() * (horse_buyer.percentage / 100)
+            # Lo pagado por encima del nuevo monto se devuelve al saldo
+            overpaid = db.execute(
+                select(BuyerInstallment.id, BuyerInstallment.amount_paid - new_amount)
+                .where(
+                    BuyerInstallment.horse_buyer_id == horse_buyer.id,
+                    BuyerInstallment.amount_paid > new_amount,
+                )
+                .order_by(BuyerInstallment.id)
+            ).all()
+            for buyer_installment_id, excess in overpaid:
+                record_balance_entry(
+                    db,
+                    user_id=horse_buyer.buyer_id,
+                    amount=excess,
                     horse_buyer_id=horse_buyer.id,
-                    installment_id=installment.id,
-                    amount=buyer_amount,
-                    amount_paid=0.0,
-                    status=PaymentStatus.PENDING,
+                    buyer_installment_id=buyer_installment_id,
+                    concept="Reajuste de cuota",
                 )
-                db.add(buyer_installment)
-        commit_session(db)
-        logger.debug(f"Cuotas recalculadas para Horse ID {horse.id}")
+            updated += db.execute(
+                update(BuyerInstallment)
+                .where(BuyerInstallment.horse_buyer_id == horse_buyer.id)
+                .values(
+                    amount=new_amount,
+                    amount_paid=case(
+                        (BuyerInstallment.amount_paid > new_amount, new_amount),
+                        else_=BuyerInstallment.amount_paid,
+                    ),
+                    status=case(
+                        (
+                            BuyerInstallment.amount_paid >= new_amount,
+                            PaymentStatus.PAID.name,
+                        ),
+                        (BuyerInstallment.amount_paid > 0, PaymentStatus.PARTIAL.name),
+                        else_=BuyerInstallment.status,
+                    ),
+                    updated_at=datetime.utcnow(),
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+
+        logger.debug(
+            f"Cuotas recalculadas para Horse ID {horse.id}: "
+            f"{inserted} insertadas, {updated} actualizadas, {deleted} eliminadas"
+        )
     except SQLAlchemyError as e:
         db.rollback()
         logger.error(f"Error al recalcular cuotas: {str(e)}")
@@ -293,6 +644,151 @@ def recalculate_installments(db: Session, horse: Horse) -> None:
         )
 
 
+def _sync_horse_buyers(
+    db: Session, horse: Horse, buyers_data: List[Dict]
+) -> Dict[int, float]:
+    """
+    Aplica `buyers_data` sobre los HorseBuyers existentes del caballo,
+    conservando las filas (y su balance) de los compradores que siguen.
+    Devuelve el porcentaje anterior de cada HorseBuyer conservado.
+    """
+    new_percentages = {
+        buyer_data["buyer_id"]: buyer_data["percentage"] for buyer_data in buyers_data
+    }
+    previous_percentages = {}
+    for horse_buyer in list(horse.buyers):
+        if horse_buyer.buyer_id not in new_percentages:
+            # Las cuotas se borran en una sola sentencia; se expira la
+            # colección para que el delete-orphan no las vuelva a borrar.
+            db.query(BuyerInstallment).filter(
+                BuyerInstallment.horse_buyer_id == horse_buyer.id
+            ).delete(synchronize_session=False)
+            db.expire(horse_buyer, ["installments"])
+            horse.buyers.remove(horse_buyer)
+            continue
+        previous_percentages[horse_buyer.id] = horse_buyer.percentage
+        horse_buyer.percentage = new_percentages.pop(horse_buyer.buyer_id)
+    for buyer_id, percentage in new_percentages.items():
+        horse.buyers.append(HorseBuyer(buyer_id=buyer_id, percentage=percentage))
+    db.flush()
+    return previous_percentages
+
+
+# ----------------------
+# Cuotas Virtuales (modo lazy)
+# ----------------------
+
+
+def _virtual_installments_query(*criteria):
+    """
+    Pares (comprador, cuota) de caballos lazy que todavía no tienen fila en
+    `buyer_installments`, filtrados por `criteria`.
+    """
+    return (
+        select(
+            HorseBuyer.id.label("horse_buyer_id"),
+            Installment.id.label("installment_id"),
+            (Installment.amount * HorseBuyer.percentage / 100).label("amount"),
+            Installment.created_at,
+            Installment.updated_at,
+        )
+        .join(Installment, Installment.horse_id == HorseBuyer.horse_id)
+        .join(Horse, Horse.id == HorseBuyer.horse_id)
+        .where(
+            Horse.lazy_installments.is_(True),
+            ~select(BuyerInstallment.id)
+            .where(
+                BuyerInstallment.horse_buyer_id == HorseBuyer.id,
+                BuyerInstallment.installment_id == Installment.id,
+            )
+            .exists(),
+            *criteria,
+        )
+    )
+
+
+def get_virtual_buyer_installments(db: Session, *criteria) -> List[BuyerInstallment]:
+    """
+    Calcula al vuelo las cuotas de compradores no materializadas. Devuelve
+    objetos transitorios (sin ID ni sesión) para serializarlos igual que las
+    cuotas persistidas.
+    """
+    return [
+        BuyerInstallment(
+            horse_buyer_id=row.horse_buyer_id,
+            installment_id=row.installment_id,
+            amount=row.amount,
+            amount_paid=0.0,
+            status=PaymentStatus.PENDING,
+            created_at=row.created_at,
+            updated_at=row.updated_at,
+        )
+        for row in db.execute(
+            _virtual_installments_query(*criteria).order_by(
+                HorseBuyer.id, Installment.installment_number
+            )
+        )
+    ]
+
+
+def materialize_buyer_installment(
+    db: Session, horse_buyer_id: int, installment_id: int
+) -> Optional[BuyerInstallment]:
+    """
+    Devuelve la cuota del comprador, persistiéndola si todavía es virtual.
+    """
+    buyer_installment = (
+        db.query(BuyerInstallment)
+        .filter(
+            BuyerInstallment.horse_buyer_id == horse_buyer_id,
+            BuyerInstallment.installment_id == installment_id,
+        )
+        .first()
+    )
+    if buyer_installment:
+        return buyer_installment
+    virtual = get_virtual_buyer_installments(
+        db, HorseBuyer.id == horse_buyer_id, Installment.id == installment_id
+    )
+    if not virtual:
+        return None
+    buyer_installment = virtual[0]
+    buyer_installment.created_at = buyer_installment.updated_at = datetime.utcnow()
+    db.add(buyer_installment)
+    db.flush()
+    logger.debug(f"Cuota virtual materializada con ID {buyer_installment.id}")
+    return buyer_installment
+
+
+def materialize_due_installments(db: Session, due_before: datetime) -> int:
+    """
+    Persiste como pendientes las cuotas virtuales vencidas antes de
+    `due_before`, para que la verificación de vencidas las procese.
+    """
+    virtual = _virtual_installments_query(Installment.due_date < due_before).subquery()
+    now = datetime.utcnow()
+    result = db.execute(
+        insert(BuyerInstallment).from_select(
+            [
+                "horse_buyer_id",
+                "installment_id",
+                "amount",
+                "created_at",
+                "updated_at",
+            ],
+            select(
+                virtual.c.horse_buyer_id,
+                virtual.c.installment_id,
+                virtual.c.amount,
+                literal(now, DateTime),
+                literal(now, DateTime),
+            ),
+        )
+    )
+    logger.debug(f"{result.rowcount} cuotas virtuales vencidas materializadas")
+    return result.rowcount
+
+
 # ----------------------
 # Validaciones
 # ----------------------
@@ -304,6 +800,9 @@ def validate_horse_buyers(buyers_data: List[Dict]) -> None:
     total_percentage = sum(buyer["percentage"] for buyer in buyers_data)
     if abs(total_percentage - 100) > 0.01:
         raise ValueError("La suma de los porcentajes debe ser 100%")
+    buyer_ids = [buyer["buyer_id"] for buyer in buyers_data]
+    if len(set(buyer_ids)) != len(buyer_ids):
+        raise ValueError("Hay compradores repetidos")
 
 
 # ----------------------
@@ -311,8 +810,15 @@ def validate_horse_buyers(buyers_data: List[Dict]) -> None:
 # ----------------------
 
 
-def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
-    return db.query(User).offset(skip).limit(limit).all()
+def get_users(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    columns: Optional[list] = None,
+) -> List[User]:
+    query = db.query(*columns) if columns else db.query(User)
+    return paginate(query, [User.id], skip=skip, limit=limit, after=after)
 
 
 def get_user(db: Session, user_id: int) -> Optional[User]:
@@ -325,12 +831,24 @@ def get_user_by_email(db: Session, email: str) -> Optional[User]:
 
 def create_user(db: Session, user: schemas.UserCreateSchema) -> User:
     db_user = User(**user.dict())
+    invalidate(db, users=[None])
     return add_and_refresh(db, db_user)
 
 
 def update_user(db: Session, user: User, user_update: schemas.UserUpdateSchema) -> User:
-    for key, value in user_update.dict(exclude_unset=True).items():
+    update_data = user_update.dict(exclude_unset=True)
+    # El balance sólo cambia a través del libro mayor
+    new_balance = update_data.pop("balance", None)
+    for key, value in update_data.items():
         setattr(user, key, value)
+    if new_balance is not None and new_balance != user.balance:
+        record_balance_entry(
+            db,
+            user_id=user.id,
+            amount=new_balance - (user.balance or 0.0),
+            concept="Ajuste manual",
+        )
+    invalidate(db, users=[user.id])
     return add_and_refresh(db, user)
 
 
@@ -338,22 +856,258 @@ def delete_user(db: Session, user_id: int) -> bool:
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         return False
+    # Sus participaciones se borran y sus transacciones quedan sin usuario
+    invalidate(
+        db,
+        horses=db.scalars(
+            select(HorseBuyer.horse_id)
+            .where(HorseBuyer.buyer_id == user_id)
+            .union(
+                select(Transaction.horse_id).where(
+                    Transaction.user_id == user_id, Transaction.horse_id.is_not(None)
+                )
+            )
+        ).all(),
+        users=[user_id],
+    )
     db.delete(user)
     commit_session(db)
     logger.debug(f"Usuario eliminado con ID {user_id}")
     return True
 
 
+def get_user_transactions(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+) -> List[Transaction]:
+    """
+    Transacciones que involucran al usuario: las que registró y las de los
+    caballos de los que es comprador, con los nombres para mostrar.
+    """
+    query = (
+        _query_with_names(db, Transaction)
+        .options(selectinload(Transaction.installment_payments))
+        .filter(
+            or_(
+                Transaction.user_id == user_id,
+                Transaction.horse_id.in_(
+                    select(HorseBuyer.horse_id).where(HorseBuyer.buyer_id == user_id)
+                ),
+            )
+        )
+    )
+    return _with_display_names(
+        paginate(
+            query,
+            [Transaction.date, Transaction.id],
+            skip=skip,
+            limit=limit,
+            after=after,
+        )
+    )
+
+
+def get_user_summary(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+) -> Optional[dict]:
+    """
+    Resumen del usuario para su página de detalle: sus participaciones con
+    los totales de cuotas por caballo (una consulta agrupada), los totales
+    generales y una página de sus transacciones.
+    """
+    user = get_user(db, user_id)
+    if not user:
+        return None
+    horses = get_horse_buyer_summaries(db, HorseBuyer.buyer_id == user_id, limit=None)
+    for horse in horses:
+        horse["share_value"] = horse["horse_total_value"] * horse["percentage"] / 100
+    return {
+        "user": user,
+        "horses": horses,
+        "paid_amount": sum(horse["paid_amount"] for horse in horses),
+        "overdue_amount": sum(horse["overdue_amount"] for horse in horses),
+        "outstanding_amount": sum(horse["outstanding_amount"] for horse in horses),
+        "transactions": get_user_transactions(
+            db, user_id, skip=skip, limit=limit, after=after
+        ),
+    }
+
+
 # ----------------------
 # CRUD para Compradores de Caballo
 # ----------------------
 
 
-def get_horse_buyers(db: Session, skip: int = 0, limit: int = 100) -> List[HorseBuyer]:
-    return db.query(HorseBuyer).offset(skip).limit(limit).all()
+def get_horse_buyers(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    names: bool = False,
+) -> List[HorseBuyer]:
+    if names:
+        return _with_display_names(
+            paginate(
+                _query_with_names(db, HorseBuyer),
+                [HorseBuyer.id],
+                skip=skip,
+                limit=limit,
+                after=after,
+            )
+        )
+    return paginate(
+        db.query(HorseBuyer), [HorseBuyer.id], skip=skip, limit=limit, after=after
+    )
 
 
-def get_horse_buyer(db: Session, horse_buyer_id: int) -> Optional[HorseBuyer]:
+def get_horse_buyer_summaries(
+    db: Session,
+    *criteria,
+    skip: int = 0,
+    limit: Optional[int] = 100,
+    after: Optional[str] = None,
+) -> List[dict]:
+    """
+    Lista HorseBuyers (filtrados por `criteria`) con totales de sus cuotas
+    (cantidades por estado y montos pagado, vencido y adeudado) y los datos
+    del comprador y del caballo, calculados en una sola consulta agrupada,
+    sin cargar las cuotas. En caballos lazy suma también las cuotas virtuales.
+    """
+    persisted = aliased(BuyerInstallment)
+    virtual_installments = (
+        Installment.horse_id == HorseBuyer.horse_id,
+        ~select(persisted.id)
+        .where(
+            persisted.horse_buyer_id == HorseBuyer.id,
+            persisted.installment_id == Installment.id,
+        )
+        .correlate(HorseBuyer, Installment)
+        .exists(),
+    )
+    virtual_count = case(
+        (
+            Horse.lazy_installments.is_(True),
+            select(func.count(Installment.id))
+            .where(*virtual_installments)
+            .correlate(HorseBuyer)
+            .scalar_subquery(),
+        ),
+        else_=0,
+    )
+    virtual_amount = case(
+        (
+            Horse.lazy_installments.is_(True),
+            select(func.coalesce(func.sum(Installment.amount), 0.0))
+            .where(*virtual_installments)
+            .correlate(HorseBuyer)
+            .scalar_subquery()
+            * HorseBuyer.percentage
+            / 100,
+        ),
+        else_=0.0,
+    )
+
+    def count_status(*statuses):
+        return func.coalesce(
+            func.sum(case((BuyerInstallment.status.in_(statuses), 1), else_=0)), 0
+        )
+
+    unpaid_amount = BuyerInstallment.amount - BuyerInstallment.amount_paid
+
+    query = (
+        db.query(
+            HorseBuyer,
+            User.name,
+            Horse.name,
+            Horse.total_value,
+            func.count(BuyerInstallment.id) + virtual_count,
+            count_status(PaymentStatus.PAID),
+            count_status(PaymentStatus.OVERDUE),
+            count_status(PaymentStatus.PENDING, PaymentStatus.PARTIAL) + virtual_count,
+            func.coalesce(func.sum(BuyerInstallment.amount_paid), 0.0),
+            func.coalesce(
+                func.sum(
+                    case(
+                        (
+                            BuyerInstallment.status == PaymentStatus.OVERDUE,
+                            unpaid_amount,
+                        ),
+                        else_=0.0,
+                    )
+                ),
+                0.0,
+            ),
+            func.coalesce(
+                func.sum(
+                    case(
+                        (BuyerInstallment.status != PaymentStatus.PAID, unpaid_amount),
+                        else_=0.0,
+                    )
+                ),
+                0.0,
+            )
+            + virtual_amount,
+        )
+        .join(Horse, Horse.id == HorseBuyer.horse_id)
+        .join(User, User.id == HorseBuyer.buyer_id)
+        .outerjoin(BuyerInstallment, BuyerInstallment.horse_buyer_id == HorseBuyer.id)
+        .filter(*criteria)
+        .group_by(HorseBuyer.id, Horse.id, User.id)
+    )
+    return [
+        {
+            "id": horse_buyer.id,
+            "horse_id": horse_buyer.horse_id,
+            "buyer_id": horse_buyer.buyer_id,
+            "percentage": horse_buyer.percentage,
+            "active": horse_buyer.active,
+            "join_date": horse_buyer.join_date,
+            "updated_at": horse_buyer.updated_at,
+            "balance": horse_buyer.balance,
+            "buyer_name": buyer_name,
+            "horse_name": horse_name,
+            "horse_total_value": horse_total_value,
+            "installments_count": installments_count,
+            "paid_installments": paid,
+            "overdue_installments": overdue,
+            "pending_installments": pending,
+            "paid_amount": paid_amount,
+            "overdue_amount": overdue_amount,
+            "outstanding_amount": outstanding,
+        }
+        for (
+            horse_buyer,
+            buyer_name,
+            horse_name,
+            horse_total_value,
+            installments_count,
+            paid,
+            overdue,
+            pending,
+            paid_amount,
+            overdue_amount,
+            outstanding,
+        ) in paginate(query, [HorseBuyer.id], skip=skip, limit=limit, after=after)
+    ]
+
+
+def get_horse_buyer(
+    db: Session, horse_buyer_id: int, names: bool = False
+) -> Optional[HorseBuyer]:
+    if names:
+        row = (
+            _query_with_names(db, HorseBuyer)
+            .filter(HorseBuyer.id == horse_buyer_id)
+            .first()
+        )
+        return _with_display_names([row])[0] if row else None
     return db.query(HorseBuyer).filter(HorseBuyer.id == horse_buyer_id).first()
 
 
@@ -376,6 +1130,7 @@ def create_horse_buyer(
         percentage=horse_buyer.percentage,
         active=horse_buyer.active,
     )
+    invalidate(db, horses=[horse_buyer.horse_id])
     return add_and_refresh(db, db_horse_buyer)
 
 
@@ -386,6 +1141,7 @@ def update_horse_buyer(
 ) -> HorseBuyer:
     for key, value in horse_buyer_update.dict(exclude_unset=True).items():
         setattr(horse_buyer, key, value)
+    invalidate(db, horses=[horse_buyer.horse_id])
     return add_and_refresh(db, horse_buyer)
 
 
@@ -398,6 +1154,7 @@ def delete_horse_buyer(db: Session, horse_buyer_id: int) -> bool:
             BuyerInstallment.horse_buyer_id == horse_buyer_id
         ).delete(synchronize_session=False)
         db.delete(horse_buyer)
+        invalidate(db, horses=[horse_buyer.horse_id])
     logger.debug(f"HorseBuyer eliminado con ID {horse_buyer_id}")
     return True
 
@@ -407,8 +1164,117 @@ def delete_horse_buyer(db: Session, horse_buyer_id: int) -> bool:
 # ----------------------
 
 
-def get_transactions(db: Session, skip: int = 0, limit: int = 100) -> List[Transaction]:
-    return db.query(Transaction).offset(skip).limit(limit).all()
+def get_transactions(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    horse_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    transaction_type: Optional[TransactionType] = None,
+    mes: Optional[int] = None,
+    año: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    names: bool = False,
+) -> List[Transaction]:
+    query = _query_with_names(db, Transaction) if names else db.query(Transaction)
+    transactions = paginate(
+        query.filter(
+            *_transaction_filters(
+                horse_id, user_id, transaction_type, mes, año, date_from, date_to
+            )
+        ),
+        [Transaction.date, Transaction.id],
+        skip=skip,
+        limit=limit,
+        after=after,
+    )
+    return _with_display_names(transactions) if names else transactions
+
+
+def _transaction_filters(
+    horse_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    transaction_type: Optional[TransactionType] = None,
+    mes: Optional[int] = None,
+    año: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> list:
+    criteria = []
+    if horse_id is not None:
+        criteria.append(Transaction.horse_id == horse_id)
+    if user_id is not None:
+        criteria.append(Transaction.user_id == user_id)
+    if transaction_type is not None:
+        criteria.append(Transaction.type == transaction_type)
+    if año is not None:
+        criteria.append(Transaction.año == año)
+    if mes is not None:
+        criteria.append(Transaction.mes == mes)
+    if date_from is not None:
+        criteria.append(Transaction.date >= date_from)
+    if date_to is not None:
+        criteria.append(Transaction.date < date_to)
+    return criteria
+
+
+def get_transaction_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    names: bool = False,
+    **filters,
+) -> List[dict]:
+    """
+    Igual que `get_transactions`, pero devuelve dicts con los campos de
+    TransactionSchema leídos como columnas, sin crear objetos ORM ni
+    validarlos. Los pagos de cuotas anidados se cargan en una sola consulta.
+    """
+    names_columns = {}
+    if names:
+        names_columns = {"user_name": User.name, "horse_name": Horse.name}
+    query = db.query(
+        *schema_columns(schemas.TransactionSchema, Transaction, **names_columns)
+    )
+    if names:
+        query = query.outerjoin(User, User.id == Transaction.user_id).outerjoin(
+            Horse, Horse.id == Transaction.horse_id
+        )
+    rows = paginate(
+        query.filter(*_transaction_filters(**filters)),
+        [Transaction.date, Transaction.id],
+        skip=skip,
+        limit=limit,
+        after=after,
+    )
+    payments: Dict[int, list] = {}
+    if rows:
+        for payment in schema_rows(
+            db.query(
+                *schema_columns(
+                    schemas.InstallmentPaymentSchema,
+                    InstallmentPayment,
+                    # El período de un pago es el de la cuota que salda
+                    mes=Installment.mes,
+                    año=Installment.año,
+                )
+            )
+            .join(
+                BuyerInstallment,
+                BuyerInstallment.id == InstallmentPayment.buyer_installment_id,
+            )
+            .join(Installment, Installment.id == BuyerInstallment.installment_id)
+            .filter(InstallmentPayment.transaction_id.in_([row.id for row in rows]))
+            .order_by(InstallmentPayment.id),
+            schemas.InstallmentPaymentSchema,
+        ):
+            payments.setdefault(payment["transaction_id"], []).append(payment)
+    return schema_rows(
+        rows, schemas.TransactionSchema, nested={"installment_payments": payments}
+    )
 
 
 def get_transaction(db: Session, transaction_id: int) -> Optional[Transaction]:
@@ -418,6 +1284,7 @@ def get_transaction(db: Session, transaction_id: int) -> Optional[Transaction]:
 def create_transaction(
     db: Session, transaction: schemas.TransactionCreateSchema
 ) -> Transaction:
+    invalidate(db, horses=[transaction.horse_id] if transaction.horse_id else [])
     return add_and_refresh(db, Transaction(**transaction.dict()))
 
 
@@ -426,8 +1293,13 @@ def update_transaction(
     transaction: Transaction,
     transaction_update: schemas.TransactionUpdateSchema,
 ) -> Transaction:
+    previous_horse_id = transaction.horse_id
     for key, value in transaction_update.dict(exclude_unset=True).items():
         setattr(transaction, key, value)
+    invalidate(
+        db,
+        horses={previous_horse_id, transaction.horse_id} - {None},
+    )
     return add_and_refresh(db, transaction)
 
 
@@ -437,6 +1309,8 @@ def delete_transaction(db: Session, transaction_id: int) -> bool:
         return False
     with db.begin():
         db.delete(transaction)
+        if transaction.horse_id:
+            invalidate(db, horses=[transaction.horse_id])
     logger.debug(f"Transacción eliminada con ID {transaction_id}")
     return True
 
@@ -446,6 +1320,108 @@ def delete_transaction(db: Session, transaction_id: int) -> bool:
 # ----------------------
 
 
+def record_balance_entry(
+    session: Session,
+    user_id: int,
+    amount: float,
+    horse_buyer_id: Optional[int] = None,
+    transaction_id: Optional[int] = None,
+    buyer_installment_id: Optional[int] = None,
+    concept: Optional[str] = None,
+) -> None:
+    """
+    Registra un movimiento en el libro mayor e incrementa atómicamente los
+    saldos acumulados del usuario y, si corresponde, del HorseBuyer.
+    No confirma la transacción.
+    """
+    session.execute(
+        insert(BalanceEntry).values(
+            user_id=user_id,
+            horse_buyer_id=horse_buyer_id,
+            amount=amount,
+            concept=concept,
+            transaction_id=transaction_id,
+            buyer_installment_id=buyer_installment_id,
+        )
+    )
+    session.execute(
+        update(User).where(User.id == user_id).values(balance=User.balance + amount)
+    )
+    horse_id = None
+    if horse_buyer_id is not None:
+        horse_id = session.execute(
+            update(HorseBuyer)
+            .where(HorseBuyer.id == horse_buyer_id)
+            .values(balance=HorseBuyer.balance + amount)
+            .returning(HorseBuyer.horse_id)
+        ).scalar()
+    invalidate(session, horses=[horse_id] if horse_id else [], users=[user_id])
+
+
+def distribute_among_buyers(
+    session: Session,
+    horse_id: int,
+    amount: float,
+    transaction_id: Optional[int] = None,
+    concept: Optional[str] = None,
+) -> None:
+    """
+    Reparte `amount` entre los compradores de un caballo según su porcentaje.
+    Son tres sentencias (inserción en el libro mayor y actualización de los
+    saldos de HorseBuyers y usuarios) sin importar la cantidad de compradores.
+    No confirma la transacción.
+    """
+    share = amount * HorseBuyer.percentage / 100
+    session.execute(
+        insert(BalanceEntry).from_select(
+            ["user_id", "horse_buyer_id", "amount", "concept", "transaction_id"],
+            select(
+                HorseBuyer.buyer_id,
+                HorseBuyer.id,
+                share,
+                literal(concept, String),
+                literal(transaction_id, Integer),
+            ).where(HorseBuyer.horse_id == horse_id),
+        )
+    )
+    session.execute(
+        update(HorseBuyer)
+        .where(HorseBuyer.horse_id == horse_id)
+        .values(balance=HorseBuyer.balance + share)
+        .execution_options(synchronize_session=False)
+    )
+    user_share = (
+        select(func.sum(share))
+        .where(HorseBuyer.horse_id == horse_id, HorseBuyer.buyer_id == User.id)
+        .scalar_subquery()
+    )
+    user_ids = session.scalars(
+        update(User)
+        .where(
+            User.id.in_(
+                select(HorseBuyer.buyer_id).where(HorseBuyer.horse_id == horse_id)
+            )
+        )
+        .values(balance=User.balance + user_share)
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    invalidate(session, horses=[horse_id], users=user_ids)
+
+
+def get_balance_entries(
+    db: Session, user_id: int, skip: int = 0, limit: int = 100
+) -> List[BalanceEntry]:
+    return (
+        db.query(BalanceEntry)
+        .filter(BalanceEntry.user_id == user_id)
+        .order_by(BalanceEntry.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+
 def process_payment(buyer_installment: BuyerInstallment, session: Session):
     if buyer_installment.status == PaymentStatus.PAID:
         logger.warning(
@@ -455,120 +1431,224 @@ def process_payment(buyer_installment: BuyerInstallment, session: Session):
     remaining_amount = buyer_installment.amount - buyer_installment.amount_paid
     buyer_installment.amount_paid += remaining_amount
     update_installment_status(buyer_installment)
-    commit_session(session)
-    logger.debug(f"Installment ID {buyer_installment.id} marked as PAID")
     horse_buyer = buyer_installment.horse_buyer
-    horse_buyer.balance -= remaining_amount
-    logger.debug(
-        f"Deducted {remaining_amount} from buyer {horse_buyer.buyer_id}, new balance: {horse_buyer.balance}"
+    record_balance_entry(
+        session,
+        user_id=horse_buyer.buyer_id,
+        amount=-remaining_amount,
+        horse_buyer_id=horse_buyer.id,
+        buyer_installment_id=buyer_installment.id,
+        concept="Pago de cuota",
     )
-    user = horse_buyer.buyer
-    user.update_total_balance()
     commit_session(session)
+    logger.debug(
+        f"Installment ID {buyer_installment.id} marked as PAID, "
+        f"deducted {remaining_amount} from buyer {horse_buyer.buyer_id}"
+    )
 
 
 def get_user_balance_detail(user_id: int, session: Session) -> dict:
-    buyer_balance_details = [
-        {"horse_id": buyer.horse_id, "balance": buyer.balance}
-        for buyer in session.query(HorseBuyer)
-        .filter(HorseBuyer.buyer_id == user_id)
-        .all()
-    ]
-    if not buyer_balance_details:
+    """
+    Detalle del saldo de un usuario en una sola sentencia: los montos
+    pendiente (incluidas las cuotas virtuales) y pagado se calculan en CTEs
+    y se unen a las tenencias del usuario, una fila por HorseBuyer. El total
+    pagado usa directamente `installment_payments.buyer_id`.
+    """
+    pending = pending_amount_query(user_id).cte("pending")
+    virtual_installments = _virtual_installments_query(
+        HorseBuyer.buyer_id == user_id
+    ).subquery()
+    virtual = select(
+        func.coalesce(func.sum(virtual_installments.c.amount), 0.0).label("amount")
+    ).cte("virtual")
+    paid = (
+        select(func.coalesce(func.sum(InstallmentPayment.amount), 0.0).label("amount"))
+        .where(InstallmentPayment.buyer_id == user_id)
+        .cte("paid")
+    )
+    rows = session.execute(
+        select(
+            User.balance,
+            pending.c.amount + virtual.c.amount,
+            paid.c.amount,
+            HorseBuyer.horse_id,
+            HorseBuyer.balance,
+        )
+        .select_from(User)
+        .join(pending, literal(True))
+        .join(virtual, literal(True))
+        .join(paid, literal(True))
+        .outerjoin(HorseBuyer, HorseBuyer.buyer_id == User.id)
+        .where(User.id == user_id)
+        .order_by(HorseBuyer.id)
+    ).all()
+    if not rows or rows[0].horse_id is None:
         raise ValueError("Usuario no tiene HorseBuyers asociados")
+    current_balance, pending_amount, paid_amount = rows[0][:3]
     return {
-        "current_balance": session.query(User.balance)
-        .filter(User.id == user_id)
-        .scalar()
-        or 0.0,
-        "pending_installments": get_pending_installments_amount(user_id, session),
-        "total_paid": get_total_paid_amount(user_id, session),
-        "horse_balances": buyer_balance_details,
+        "current_balance": current_balance or 0.0,
+        "pending_installments": pending_amount,
+        "total_paid": paid_amount,
+        "horse_balances": [
+            {"horse_id": horse_id, "balance": balance} for *_, horse_id, balance in rows
+        ],
     }
 
 
 def get_total_paid_amount(buyer_id: int, session: Session) -> float:
     return (
         session.query(func.sum(InstallmentPayment.amount))
-        .join(BuyerInstallment)
-        .join(HorseBuyer)
-        .filter(HorseBuyer.buyer_id == buyer_id)
+        .filter(InstallmentPayment.buyer_id == buyer_id)
         .scalar()
         or 0.0
     )
 
 
-def get_pending_installments_amount(buyer_id: int, session: Session) -> float:
+def pending_amount_query(buyer_id: int):
+    """
+    Monto adeudado en las cuotas persistidas impagas del usuario. Se resuelve
+    con `ix_horse_buyers_buyer_id` y el índice parcial
+    `ix_buyer_installments_unpaid`.
+    """
     return (
-        session.query(func.sum(BuyerInstallment.amount - BuyerInstallment.amount_paid))
+        select(
+            func.coalesce(
+                func.sum(BuyerInstallment.amount - BuyerInstallment.amount_paid), 0.0
+            ).label("amount")
+        )
         .join(HorseBuyer)
-        .filter(
+        .where(
             HorseBuyer.buyer_id == buyer_id,
+            BuyerInstallment.status
+            != BuyerInstallment.status_literal(PaymentStatus.PAID),
             BuyerInstallment.status.in_([PaymentStatus.PENDING, PaymentStatus.PARTIAL]),
         )
-        .scalar()
-        or 0.0
     )
 
 
+def get_pending_installments_amount(buyer_id: int, session: Session) -> float:
+    persisted = session.scalar(pending_amount_query(buyer_id))
+    virtual = _virtual_installments_query(HorseBuyer.buyer_id == buyer_id).subquery()
+    return persisted + (session.query(func.sum(virtual.c.amount)).scalar() or 0.0)
+
+
 # ----------------------
 # CRUD para Caballos
 # ----------------------
 
 
-def get_horses(db: Session, skip: int = 0, limit: int = 100) -> List[Horse]:
-    return db.query(Horse).offset(skip).limit(limit).all()
+def get_horses(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    columns: Optional[list] = None,
+) -> List[Horse]:
+    query = db.query(*columns) if columns else db.query(Horse)
+    return paginate(query, [Horse.id], skip=skip, limit=limit, after=after)
 
 
-def get_horse(db: Session, horse_id: int) -> Optional[Horse]:
-    return (
-        db.query(Horse)
-        .options(
-            joinedload(Horse.buyers),
-            joinedload(Horse.transactions),
-            joinedload(Horse.installments).joinedload(Installment.buyer_installments),
+# Secciones anidadas del detalle de un caballo que se pueden pedir con `include`
+HORSE_DETAIL_SECTIONS = (
+    "buyers",
+    "buyers.installments",
+    "transactions",
+    "installments",
+)
+
+
+def get_horse(
+    db: Session,
+    horse_id: int,
+    include: Optional[Set[str]] = None,
+    names: bool = False,
+) -> Optional[Horse]:
+    """
+    Obtiene un caballo con las colecciones de `include` (por defecto todas).
+    Cada colección se carga con una consulta por nivel (selectin) en lugar de
+    un único JOIN cuyo resultado es el producto de todas las colecciones.
+    Las colecciones no incluidas quedan vacías sin consultar la base.
+    Con `names`, los compradores y transacciones traen el nombre del usuario
+    unido en la misma consulta que los carga.
+    """
+    if include is None:
+        include = set(HORSE_DETAIL_SECTIONS)
+    options = []
+    if "buyers" in include:
+        buyers = selectinload(Horse.buyers)
+        if "buyers.installments" in include:
+            options.append(
+                buyers.selectinload(HorseBuyer.installments).selectinload(
+                    BuyerInstallment.payments
+                )
+            )
+        else:
+            options.append(buyers.noload(HorseBuyer.installments))
+        if names:
+            options.append(buyers.joinedload(HorseBuyer.buyer).load_only(User.name))
+    else:
+        options.append(noload(Horse.buyers))
+    if "transactions" in include:
+        transactions = selectinload(Horse.transactions)
+        options.append(transactions.selectinload(Transaction.installment_payments))
+        if names:
+            options.append(
+                transactions.joinedload(Transaction.user).load_only(User.name)
+            )
+    else:
+        options.append(noload(Horse.transactions))
+    if "installments" in include:
+        options.append(
+            selectinload(Horse.installments)
+            .selectinload(Installment.buyer_installments)
+            .selectinload(BuyerInstallment.payments)
         )
-        .filter(Horse.id == horse_id)
-        .first()
-    )
+    else:
+        options.append(noload(Horse.installments))
+    horse = db.query(Horse).options(*options).filter(Horse.id == horse_id).first()
+    if horse and names:
+        _with_display_names(
+            [(buyer, buyer.buyer.name, horse.name) for buyer in horse.buyers]
+            + [
+                (transaction, transaction.user and transaction.user.name, horse.name)
+                for transaction in horse.transactions
+            ]
+        )
+    return horse
 
 
 def update_horse(
     db: Session, horse: Horse, horse_update: schemas.HorseUpdateSchema
 ) -> Horse:
     try:
-        with db.begin():
-            for key, value in horse_update.dict(exclude_unset=True).items():
-                if key != "buyers_data":
-                    setattr(horse, key, value)
-            if "buyers_data" in horse_update.dict(exclude_unset=True):
-                buyers_data = horse_update.buyers_data
-                validate_horse_buyers(buyers_data)
-                existing_buyers = (
-                    db.query(HorseBuyer).filter(HorseBuyer.horse_id == horse.id).all()
-                )
-                for buyer in existing_buyers:
-                    db.query(BuyerInstallment).filter(
-                        BuyerInstallment.horse_buyer_id == buyer.id
-                    ).delete(synchronize_session=False)
-                    db.delete(buyer)
-                for buyer_data in buyers_data:
-                    horse_buyer = HorseBuyer(
-                        horse_id=horse.id,
-                        buyer_id=buyer_data["buyer_id"],
-                        percentage=buyer_data["percentage"],
-                    )
-                    db.add(horse_buyer)
-                recalculate_installments(db, horse)
+        update_data = horse_update.dict(exclude_unset=True)
+        buyers_data = update_data.pop("buyers_data", None)
+        if buyers_data is not None:
+            # Se valida antes de tocar el caballo
+            validate_horse_buyers(buyers_data)
+        for key, value in update_data.items():
+            setattr(horse, key, value)
+        if buyers_data is not None:
+            previous_percentages = _sync_horse_buyers(db, horse, buyers_data)
+            recalculate_installments(db, horse, previous_percentages)
+        invalidate(db, horse_rows=[horse.id])
+        commit_session(db)
         db.refresh(horse)
         logger.debug(f"Caballo actualizado con ID {horse.id}")
         return horse
+    except IntegrityError as e:
+        # Compradores inexistentes (claves foráneas) al sincronizar
+        db.rollback()
+        logger.error(f"Integrity error al actualizar el caballo: {str(e.orig)}")
+        raise HTTPException(status_code=400, detail=f"Datos inválidos: {str(e.orig)}")
     except SQLAlchemyError as e:
+        db.rollback()
         logger.error(f"Error al actualizar el caballo: {str(e)}")
         raise HTTPException(
             status_code=500, detail=f"Error al actualizar el caballo: {str(e)}"
         )
     except ValueError as ve:
+        db.rollback()
         logger.error(f"Validación fallida al actualizar caballo: {str(ve)}")
         raise HTTPException(status_code=400, detail=str(ve))
 
@@ -594,6 +1674,7 @@ def delete_horse(db: Session, horse_id: int) -> bool:
                 synchronize_session=False
             )
             db.delete(horse)
+            invalidate(db, horse_rows=[horse_id])
         logger.debug(f"Caballo eliminado con ID {horse_id}")
         return True
     except SQLAlchemyError as e:
@@ -605,3 +1686,151 @@ def delete_horse(db: Session, horse_id: int) -> bool:
 
 def get_installment(db: Session, installment_id: int) -> Optional[Installment]:
     return db.query(Installment).filter(Installment.id == installment_id).first()
+
+
+# ----------------------
+# Informes
+# ----------------------
+
+
+def get_horse_report(db: Session, horse_id: int, mes: int, año: int) -> Optional[dict]:
+    """
+    Arma el informe mensual de un caballo: la cuota de cada comprador en el
+    período, las transacciones del período, la parte de cada comprador en
+    cada transacción y los totales. Usa una cantidad fija de consultas, sin
+    importar cuántos compradores tenga el caballo.
+
+    La parte de un comprador es su porcentaje del monto en PREMIO (a favor) y
+    EGRESO (en contra), y el monto completo de los INGRESO que registró él.
+    """
+    horse = db.get(Horse, horse_id)
+    if not horse:
+        return None
+
+    buyers = _with_display_names(
+        _query_with_names(db, HorseBuyer)
+        .filter(HorseBuyer.horse_id == horse_id)
+        .order_by(HorseBuyer.id)
+    )
+    period = (
+        Installment.horse_id == horse_id,
+        Installment.mes == mes,
+        Installment.año == año,
+    )
+    installments = (
+        db.query(BuyerInstallment)
+        .join(Installment)
+        .options(selectinload(BuyerInstallment.payments))
+        .filter(*period)
+        .order_by(BuyerInstallment.horse_buyer_id, Installment.installment_number)
+        .all()
+    )
+    if horse.lazy_installments:
+        installments += get_virtual_buyer_installments(db, *period)
+
+    transaction_period = (
+        Transaction.horse_id == horse_id,
+        Transaction.mes == mes,
+        Transaction.año == año,
+    )
+    transactions = _with_display_names(
+        _query_with_names(db, Transaction)
+        .options(selectinload(Transaction.installment_payments))
+        .filter(*transaction_period)
+        .order_by(Transaction.date, Transaction.id)
+    )
+    transactions_by_type = dict(
+        db.query(Transaction.type, func.sum(Transaction.total_amount))
+        .filter(*transaction_period)
+        .group_by(Transaction.type)
+    )
+
+    percentage_share = Transaction.total_amount * HorseBuyer.percentage / 100
+    shares = (
+        db.query(
+            HorseBuyer.id,
+            Transaction.id,
+            func.sum(
+                case(
+                    (Transaction.type == TransactionType.PREMIO, percentage_share),
+                    (Transaction.type == TransactionType.EGRESO, -percentage_share),
+                    else_=Transaction.total_amount,
+                )
+            ),
+        )
+        .join(
+            Transaction,
+            and_(
+                Transaction.horse_id == HorseBuyer.horse_id,
+                or_(
+                    Transaction.type.in_(
+                        [TransactionType.PREMIO, TransactionType.EGRESO]
+                    ),
+                    and_(
+                        Transaction.type == TransactionType.INGRESO,
+                        Transaction.user_id == HorseBuyer.buyer_id,
+                    ),
+                ),
+            ),
+        )
+        .filter(
+            HorseBuyer.horse_id == horse_id,
+            Transaction.mes == mes,
+            Transaction.año == año,
+        )
+        .group_by(HorseBuyer.id, Transaction.id)
+        .order_by(Transaction.date, Transaction.id)
+    )
+
+    shares_by_buyer: Dict[int, list] = {}
+    for horse_buyer_id, transaction_id, amount in shares:
+        shares_by_buyer.setdefault(horse_buyer_id, []).append(
+            {"transaction_id": transaction_id, "amount": amount}
+        )
+    installments_by_buyer: Dict[int, list] = {}
+    for installment in installments:
+        installments_by_buyer.setdefault(installment.horse_buyer_id, []).append(
+            installment
+        )
+
+    report_buyers = []
+    for buyer in buyers:
+        buyer_installments = installments_by_buyer.get(buyer.id, [])
+        buyer_shares = shares_by_buyer.get(buyer.id, [])
+        pending = sum(
+            installment.amount - installment.amount_paid
+            for installment in buyer_installments
+        )
+        transactions_total = sum(share["amount"] for share in buyer_shares)
+        report_buyers.append(
+            {
+                "horse_buyer_id": buyer.id,
+                "buyer_id": buyer.buyer_id,
+                "buyer_name": buyer.buyer_name,
+                "percentage": buyer.percentage,
+                "balance": buyer.balance,
+                "installments": buyer_installments,
+                "shares": buyer_shares,
+                "installments_pending": pending,
+                "transactions_total": transactions_total,
+                "total": buyer.balance + transactions_total - pending,
+            }
+        )
+
+    return {
+        "horse_id": horse.id,
+        "horse_name": horse.name,
+        "mes": mes,
+        "año": año,
+        "buyers": report_buyers,
+        "transactions": transactions,
+        "totals": {
+            "installments_amount": sum(i.amount for i in installments),
+            "installments_paid": sum(i.amount_paid for i in installments),
+            "installments_pending": sum(i.amount - i.amount_paid for i in installments),
+            "transactions_by_type": {
+                transaction_type.value: total
+                for transaction_type, total in transactions_by_type.items()
+            },
+        },
+    }
@@ -0,0 +1,220 @@
+# backend/prod/api/export.py
+
+from sqlalchemy import literal, null, select
+from .crud import _transaction_filters, _virtual_installments_query
+from .models import (
+    get_db,
+    BuyerInstallment,
+    HorseBuyer,
+    Installment,
+    InstallmentPayment,
+    PaymentStatus,
+    Transaction,
+)
+from .serialization import dumps
+from datetime import date, datetime
+from enum import Enum
+from typing import Iterator, List, Optional
+import csv
+import io
+
+# Filas leídas de la base por lote (y enviadas al cliente por bloque)
+EXPORT_BATCH_SIZE = 1000
+
+
+class ExportEntity(str, Enum):
+    TRANSACTIONS = "transactions"
+    BUYER_INSTALLMENTS = "buyer_installments"
+    INSTALLMENT_PAYMENTS = "installment_payments"
+
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+    ExportFormat.NDJSON: "application/x-ndjson",
+}
+
+# ----------------------
+# Consultas por entidad
+# ----------------------
+
+
+def _transactions_queries(horse_id, user_id, date_from, date_to) -> List:
+    return [
+        select(*Transaction.__table__.c)
+        .where(
+            *_transaction_filters(
+                horse_id=horse_id,
+                user_id=user_id,
+                date_from=date_from,
+                date_to=date_to,
+            )
+        )
+        .order_by(Transaction.id)
+    ]
+
+
+def _buyer_installments_queries(horse_id, user_id, date_from, date_to) -> List:
+    """
+    Cuotas de compradores persistidas y, a continuación, las virtuales de los
+    caballos lazy (sin ID), igual que en el listado de cuotas. El rango de
+    fechas se aplica sobre el vencimiento.
+    """
+    criteria = []
+    if horse_id is not None:
+        criteria.append(HorseBuyer.horse_id == horse_id)
+    if user_id is not None:
+        criteria.append(HorseBuyer.buyer_id == user_id)
+    if date_from is not None:
+        criteria.append(Installment.due_date >= date_from)
+    if date_to is not None:
+        criteria.append(Installment.due_date < date_to)
+
+    period = [
+        HorseBuyer.horse_id,
+        HorseBuyer.buyer_id,
+        Installment.mes,
+        Installment.año,
+        Installment.due_date,
+    ]
+    stored = (
+        select(
+            BuyerInstallment.id,
+            BuyerInstallment.horse_buyer_id,
+            BuyerInstallment.installment_id,
+            *period,
+            BuyerInstallment.amount,
+            BuyerInstallment.amount_paid,
+            BuyerInstallment.status,
+            BuyerInstallment.last_payment_date,
+            BuyerInstallment.created_at,
+            BuyerInstallment.updated_at,
+        )
+        .join(HorseBuyer, HorseBuyer.id == BuyerInstallment.horse_buyer_id)
+        .join(Installment, Installment.id == BuyerInstallment.installment_id)
+        .where(*criteria)
+        .order_by(BuyerInstallment.id)
+    )
+    virtual = _virtual_installments_query(*criteria).subquery()
+    virtual = (
+        select(
+            null().label("id"),
+            virtual.c.horse_buyer_id,
+            virtual.c.installment_id,
+            *period,
+            virtual.c.amount,
+            literal(0.0).label("amount_paid"),
+            BuyerInstallment.status_literal(PaymentStatus.PENDING).label("status"),
+            null().label("last_payment_date"),
+            virtual.c.created_at,
+            virtual.c.updated_at,
+        )
+        .join(HorseBuyer, HorseBuyer.id == virtual.c.horse_buyer_id)
+        .join(Installment, Installment.id == virtual.c.installment_id)
+        .order_by(HorseBuyer.id, Installment.installment_number)
+    )
+    return [stored, virtual]
+
+
+def _installment_payments_queries(horse_id, user_id, date_from, date_to) -> List:
+    """
+    Pagos de cuotas con el caballo y el período (`mes`/`año`) de la cuota que
+    saldan. El rango de fechas se aplica sobre la fecha de pago.
+    """
+    criteria = []
+    if horse_id is not None:
+        criteria.append(Installment.horse_id == horse_id)
+    if user_id is not None:
+        criteria.append(InstallmentPayment.buyer_id == user_id)
+    if date_from is not None:
+        criteria.append(InstallmentPayment.payment_date >= date_from)
+    if date_to is not None:
+        criteria.append(InstallmentPayment.payment_date < date_to)
+    return [
+        select(
+            *InstallmentPayment.__table__.c,
+            Installment.horse_id,
+            Installment.mes,
+            Installment.año,
+        )
+        .join(
+            BuyerInstallment,
+            BuyerInstallment.id == InstallmentPayment.buyer_installment_id,
+        )
+        .join(Installment, Installment.id == BuyerInstallment.installment_id)
+        .where(*criteria)
+        .order_by(InstallmentPayment.id)
+    ]
+
+
+EXPORT_QUERIES = {
+    ExportEntity.TRANSACTIONS: _transactions_queries,
+    ExportEntity.BUYER_INSTALLMENTS: _buyer_installments_queries,
+    ExportEntity.INSTALLMENT_PAYMENTS: _installment_payments_queries,
+}
+
+# ----------------------
+# Codificación
+# ----------------------
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _encode_csv(rows, header: Optional[List[str]]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header is not None:
+        writer.writerow(header)
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+def _encode_ndjson(rows, keys: List[str]) -> bytes:
+    return b"".join(dumps(dict(zip(keys, row))) + b"\n" for row in rows)
+
+
+def export_rows(
+    entity: ExportEntity,
+    export_format: ExportFormat,
+    horse_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> Iterator[bytes]:
+    """
+    Genera la exportación de `entity` en bloques de bytes, leyendo la base
+    con un cursor del lado del servidor de a EXPORT_BATCH_SIZE filas, de modo
+    que la memoria usada no depende del tamaño de la tabla. Abre su propia
+    sesión, que vive mientras se envía la respuesta.
+    """
+    queries = EXPORT_QUERIES[entity](horse_id, user_id, date_from, date_to)
+    db_generator = get_db()
+    db = next(db_generator)
+    try:
+        header_sent = False
+        for query in queries:
+            result = db.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            keys = list(result.keys())
+            if export_format == ExportFormat.CSV and not header_sent:
+                # El encabezado se envía antes de leer el primer lote
+                header_sent = True
+                yield _encode_csv([], keys)
+            for rows in result.partitions():
+                if export_format == ExportFormat.CSV:
+                    yield _encode_csv(rows, None)
+                else:
+                    yield _encode_ndjson(rows, keys)
+    finally:
+        db.close()
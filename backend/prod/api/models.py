@@ -18,6 +18,13 @@ from sqlalchemy import (
     UniqueConstraint,
     Index,
     create_engine,
+    event,
+    false,
+    inspect,
+    insert,
+    literal,
+    select,
+    text,
 )
 from sqlalchemy.orm import (
     relationship,
@@ -28,13 +35,16 @@ from sqlalchemy.orm import (
     joinedload,
 )
 from datetime import datetime, timedelta
-from typing import List, Generator
+from typing import AsyncGenerator, List, Generator
 from contextlib import contextmanager
 import enum
+import os
+from sqlalchemy.engine import make_url
 from sqlalchemy.exc import SQLAlchemyError
 import logging
 from fastapi import HTTPException
 from pythonjsonlogger import jsonlogger
+from .settings import settings
 
 # Configuración de logging en formato JSON
 logger = logging.getLogger(__name__)
@@ -49,18 +59,115 @@ logger.addHandler(logHandler)
 metadata = MetaData()
 Base = declarative_base(metadata=metadata)
 
-# Configuración de la base de datos
-SQLALCHEMY_DATABASE_URL = "sqlite:///./horses.db"
+# Configuración de la base de datos (ver settings.py)
+SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args=(
-        {"check_same_thread": False} if "sqlite" in SQLALCHEMY_DATABASE_URL else {}
-    ),
-)
+
+# Drivers asíncronos por motor para el modo async (settings.db_async)
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def _engine_options(url) -> dict:
+    """
+    Opciones comunes del engine síncrono y del asíncrono para `url`: pool
+    dimensionado según la configuración y, fuera de SQLite, verificación de
+    las conexiones antes de usarlas.
+    """
+    sqlite = url.get_backend_name() == "sqlite"
+    options = {"echo": settings.db_echo}
+    if sqlite:
+        options["connect_args"] = {"check_same_thread": False}
+    else:
+        options["pool_pre_ping"] = True
+    if not sqlite or url.database not in (None, "", ":memory:"):
+        # Las bases SQLite en memoria usan un pool de una sola conexión
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+        )
+    return options
+
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL):
+    """
+    Crea el engine para `url`. En SQLite aplica el perfil de PRAGMAs de la
+    configuración a cada conexión nueva.
+    """
+    url = make_url(url)
+    db_engine = create_engine(url, **_engine_options(url))
+    if url.get_backend_name() == "sqlite":
+        event.listen(db_engine, "connect", _apply_sqlite_pragmas)
+    return db_engine
+
+
+def create_async_db_engine(url: str = SQLALCHEMY_DATABASE_URL):
+    """
+    Crea el engine asíncrono para la misma base que `url`, con su driver
+    asíncrono (aiosqlite, asyncpg) salvo que `async_database_url` indique
+    otro. Requiere tener instalado ese driver.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    if settings.async_database_url:
+        url = make_url(settings.async_database_url)
+    else:
+        url = make_url(url)
+        driver = ASYNC_DRIVERS.get(url.get_backend_name())
+        if driver is None:
+            raise ValueError(f"No hay driver asíncrono para {url.get_backend_name()}")
+        url = url.set(drivername=f"{url.get_backend_name()}+{driver}")
+    db_engine = create_async_engine(url, **_engine_options(url))
+    if url.get_backend_name() == "sqlite":
+        event.listen(db_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return db_engine
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Con WAL los lectores siguen leyendo mientras se confirma una escritura, y
+    con synchronous=NORMAL sólo se sincroniza el disco en cada checkpoint.
+    busy_timeout hace esperar a los escritores concurrentes en lugar de
+    fallar con "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in (
+            f"journal_mode={settings.sqlite_journal_mode}",
+            f"synchronous={settings.sqlite_synchronous}",
+            f"busy_timeout={settings.sqlite_busy_timeout_ms}",
+            f"mmap_size={settings.sqlite_mmap_size}",
+            f"cache_size=-{settings.sqlite_cache_size_kib}",
+            f"foreign_keys={'ON' if settings.sqlite_foreign_keys else 'OFF'}",
+        ):
+            cursor.execute(f"PRAGMA {pragma}")
+    finally:
+        cursor.close()
+
+
+engine = create_db_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Modo async: las rutas de lectura usan sesiones asíncronas (ver
+# routes.read_route); las escrituras y los procesos en segundo plano siguen
+# usando `SessionLocal`.
+async_engine = None
+AsyncSessionLocal = None
+if settings.db_async:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = create_async_db_engine()
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
+# Modo de cuotas lazy: las cuotas de los compradores de caballos nuevos no se
+# materializan al crearlos, se calculan al vuelo y se persisten sólo al pagarse
+# o vencerse.
+LAZY_INSTALLMENTS = settings.lazy_installments
+
 
 def get_db() -> Generator:
     """
@@ -73,6 +180,14 @@ def get_db() -> Generator:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator:
+    """
+    Generador para obtener una sesión asíncrona de base de datos (modo async).
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 # Enumeraciones compartidas
 class TransactionType(enum.Enum):
     INGRESO = "INGRESO"
@@ -112,6 +227,9 @@ class User(Base):
     transactions = relationship(
         "Transaction", back_populates="user", cascade="all, delete-orphan"
     )
+    balance_entries = relationship(
+        "BalanceEntry", back_populates="user", cascade="all, delete-orphan"
+    )
 
     # Validaciones
     @validates("email")
@@ -130,14 +248,6 @@ class User(Base):
             assert isinstance(value, str), "DNI debe ser una cadena de caracteres"
         return value
 
-    def update_total_balance(self):
-        """
-        Actualiza el balance total del usuario sumando los balances de todos los HorseBuyers.
-        """
-        self.balance = sum(
-            buyer.balance for buyer in self.horses_buying if not buyer.horse.is_deleted
-        )
-
 
 # Modelo Horse
 class Horse(Base):
@@ -151,8 +261,11 @@ class Horse(Base):
     total_value = Column(Float, nullable=False)
     number_of_installments = Column(Integer, nullable=False)
     creation_date = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     total_percentage = Column(Float, default=0.0)  # Corrección aquí
     is_deleted = Column(Boolean, default=False)  # Campo para soft delete
+    # Cuotas de compradores calculadas al vuelo (ver LAZY_INSTALLMENTS)
+    lazy_installments = Column(Boolean, default=False, server_default=false())
 
     # Relaciones
     buyers = relationship(
@@ -202,11 +315,18 @@ class HorseBuyer(Base):
         "BuyerInstallment", back_populates="horse_buyer", cascade="all, delete-orphan"
     )
 
+    # Nombres para mostrar; sólo se completan cuando la consulta los pide
+    # (ver crud._with_display_names), si no quedan en None.
+    buyer_name = None
+    horse_name = None
+
     __table_args__ = (
         UniqueConstraint("horse_id", "buyer_id", name="uix_horse_buyer"),
         CheckConstraint(
             "percentage > 0 AND percentage <= 100", name="check_valid_percentage"
         ),
+        # Tenencias de un usuario (balance y detalle por usuario)
+        Index("ix_horse_buyers_buyer_id", "buyer_id"),
     )
 
     @validates("percentage")
@@ -245,6 +365,10 @@ class Installment(Base):
         CheckConstraint(
             "installment_number > 0", name="check_positive_installment_number"
         ),
+        # Cuotas de un caballo en un período (cuotas por mes, informes)
+        Index("ix_installments_horse_period", "horse_id", "año", "mes"),
+        # Verificación de cuotas vencidas
+        Index("ix_installments_due_date", "due_date"),
     )
 
 
@@ -283,8 +407,36 @@ class BuyerInstallment(Base):
         ),
         Index("ix_buyer_installments_horse_buyer_id", "horse_buyer_id"),
         Index("ix_buyer_installments_installment_id", "installment_id"),
+        # Índices parciales: las consultas deben usar `status_literal` para
+        # que SQLite pueda elegirlos (no los considera con parámetros).
+        # Montos pendientes por comprador
+        Index(
+            "ix_buyer_installments_unpaid",
+            "horse_buyer_id",
+            sqlite_where=text("status != 'PAID'"),
+            postgresql_where=text("status != 'PAID'"),
+        ),
+        # Barrido de cuotas vencidas: recorre las pendientes en orden de ID
+        Index("ix_buyer_installments_status_id", "status", "id"),
+        # Verificación incremental: cuotas creadas desde la última ejecución
+        Index("ix_buyer_installments_created_at", "created_at"),
+        # Verificación de cuotas vencidas
+        Index(
+            "ix_buyer_installments_pending",
+            "installment_id",
+            sqlite_where=text("status = 'PENDING'"),
+            postgresql_where=text("status = 'PENDING'"),
+        ),
     )
 
+    @staticmethod
+    def status_literal(status: PaymentStatus):
+        """
+        Estado como literal SQL en lugar de parámetro, para que el planificador
+        pueda usar los índices parciales sobre `status`.
+        """
+        return literal(status, BuyerInstallment.status.type, literal_execute=True)
+
 
 # Modelo InstallmentPayment
 class InstallmentPayment(Base):
@@ -346,12 +498,67 @@ class Transaction(Base):
         "InstallmentPayment", back_populates="transaction", cascade="all, delete-orphan"
     )
 
+    # Nombres para mostrar (ver crud._with_display_names)
+    user_name = None
+    horse_name = None
+
     __table_args__ = (
         CheckConstraint(
             "type IN ('INGRESO', 'EGRESO', 'PREMIO', 'PAGO')",
             name="check_transaction_type",
         ),
+        Index("ix_transactions_date_id", "date", "id"),
+        Index("ix_transactions_horse_period", "horse_id", "año", "mes"),
+        Index("ix_transactions_user_date", "user_id", "date"),
+        Index("ix_transactions_type_date", "type", "date"),
+        Index("ix_transactions_period", "año", "mes"),
+    )
+
+
+# Modelo BalanceEntry: libro mayor de balances, sólo se agregan filas.
+# User.balance y HorseBuyer.balance son los saldos acumulados de estas filas.
+class BalanceEntry(Base):
+    __tablename__ = "balance_entries"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    horse_buyer_id = Column(
+        Integer, ForeignKey("horse_buyers.id", ondelete="SET NULL"), nullable=True
+    )
+    amount = Column(Float, nullable=False)
+    concept = Column(String(255))
+    transaction_id = Column(
+        Integer, ForeignKey("transactions.id", ondelete="SET NULL"), nullable=True
+    )
+    buyer_installment_id = Column(
+        Integer,
+        ForeignKey("buyer_installments.id", ondelete="SET NULL"),
+        nullable=True,
     )
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relaciones
+    user = relationship("User", back_populates="balance_entries")
+
+    __table_args__ = (
+        Index("ix_balance_entries_user_id", "user_id", "id"),
+        Index("ix_balance_entries_horse_buyer_id", "horse_buyer_id"),
+    )
+
+
+# Modelo JobCheckpoint: marca de avance persistida de los procesos periódicos
+class JobCheckpoint(Base):
+    __tablename__ = "job_checkpoints"
+
+    name = Column(String(100), primary_key=True)
+    high_water_mark = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Concepto de los movimientos que registran los saldos previos al libro mayor
+OPENING_BALANCE_CONCEPT = "Saldo inicial"
 
 
 # Funciones de Utilidad y Lógica de Negocio movidas a crud.py
@@ -359,4 +566,122 @@ def create_tables():
     """
     Crea las tablas en la base de datos.
     """
+    inspector = inspect(engine)
+    new_ledger = inspector.has_table("users") and not inspector.has_table(
+        BalanceEntry.__tablename__
+    )
     metadata.create_all(engine)
+    _add_missing_columns()
+    _create_missing_indexes()
+    if new_ledger:
+        _backfill_opening_balances()
+    _check_foreign_keys()
+
+
+def _add_missing_columns():
+    """
+    Agrega a las tablas existentes las columnas nuevas de los modelos, ya que
+    `create_all` no altera tablas ya creadas. Es idempotente.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = (
+                    f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" '
+                    f"{column.type.compile(dialect=engine.dialect)}"
+                )
+                if column.server_default is not None:
+                    default = column.server_default.arg.compile(
+                        dialect=engine.dialect,
+                        compile_kwargs={"literal_binds": True},
+                    )
+                    ddl += f" DEFAULT {default}"
+                connection.execute(text(ddl))
+                logger.info(f"Columna {table.name}.{column.name} agregada")
+
+
+def _create_missing_indexes():
+    """
+    Crea en las tablas existentes los índices nuevos de los modelos, ya que
+    `create_all` sólo los crea junto con la tabla. Es idempotente.
+    """
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
+
+
+def _backfill_opening_balances():
+    """
+    Al crear el libro mayor en una base existente, registra como "Saldo
+    inicial" los saldos acumulados hasta entonces, para que cada saldo siga
+    siendo la suma de sus movimientos: una fila por HorseBuyer con saldo y
+    otra por usuario con la parte de su saldo ajena a sus HorseBuyers.
+    """
+    holdings = (
+        select(
+            HorseBuyer.buyer_id,
+            func.coalesce(func.sum(HorseBuyer.balance), 0.0).label("balance"),
+        )
+        .group_by(HorseBuyer.buyer_id)
+        .subquery()
+    )
+    remainder = func.coalesce(User.balance, 0.0) - func.coalesce(
+        holdings.c.balance, 0.0
+    )
+    with engine.begin() as connection:
+        horse_buyers = connection.execute(
+            insert(BalanceEntry).from_select(
+                ["user_id", "horse_buyer_id", "amount", "concept"],
+                select(
+                    HorseBuyer.buyer_id,
+                    HorseBuyer.id,
+                    HorseBuyer.balance,
+                    literal(OPENING_BALANCE_CONCEPT),
+                ).where(HorseBuyer.balance != 0),
+            )
+        ).rowcount
+        users = connection.execute(
+            insert(BalanceEntry).from_select(
+                ["user_id", "horse_buyer_id", "amount", "concept"],
+                select(
+                    User.id,
+                    literal(None, Integer),
+                    remainder,
+                    literal(OPENING_BALANCE_CONCEPT),
+                ).outerjoin(holdings, holdings.c.buyer_id == User.id)
+                # Descarta los restos de redondeo de la suma de floats
+                .where(func.abs(remainder) > 1e-9),
+            )
+        ).rowcount
+    logger.info(
+        f"Libro mayor creado con saldos iniciales: {horse_buyers} de HorseBuyers "
+        f"y {users} de usuarios"
+    )
+
+
+def _check_foreign_keys():
+    """
+    Registra las filas que referencian filas inexistentes. Con foreign_keys=ON
+    SQLite rechaza cualquier cambio que las toque, y las bases creadas sin esa
+    verificación pueden tenerlas.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect() as connection:
+        violations = connection.exec_driver_sql("PRAGMA foreign_key_check").all()
+    by_reference = {}
+    for table, rowid, parent, _ in violations:
+        by_reference.setdefault((table, parent), []).append(rowid)
+    for (table, parent), rowids in by_reference.items():
+        logger.error(
+            f"{len(rowids)} filas de {table} referencian filas inexistentes de "
+            f"{parent} (rowid {', '.join(map(str, rowids[:10]))}"
+            f"{', ...' if len(rowids) > 10 else ''})"
+        )
@@ -1,50 +1,340 @@
 # backend/prod/api/overdue_checker.py
 
+from sqlalchemy import and_, bindparam, func, insert, literal, select, union, update
 from sqlalchemy.orm import Session
-from .crud import update_installment_status
-from .models import get_db, BuyerInstallment, Installment, PaymentStatus
+from .cache import invalidate
+from .crud import materialize_due_installments
+from .models import (
+    get_db,
+    BalanceEntry,
+    BuyerInstallment,
+    HorseBuyer,
+    Installment,
+    JobCheckpoint,
+    PaymentStatus,
+    User,
+    String,
+)
+from .settings import settings
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Dict, Iterator, List, Optional
 import logging
+import threading
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# Cantidad máxima de cuotas procesadas por transacción, para no bloquear a los
+# lectores durante barridos grandes.
+OVERDUE_CHUNK_SIZE = 500
 
-def check_overdue_installments():
+# Intervalo en segundos entre verificaciones automáticas
+OVERDUE_CHECK_INTERVAL = settings.overdue_check_interval
+
+# Nombre del checkpoint con la última fecha de vencimiento procesada
+CHECKPOINT_NAME = "overdue_installments"
+
+# Cantidad de ejecuciones recientes que se conservan para consulta
+MAX_TRACKED_JOBS = 50
+
+
+def _mark_chunk_overdue(db: Session, ids: List[int]) -> int:
+    """
+    Marca como vencidas las cuotas `ids` con sentencias por conjunto: una
+    inserción en el libro mayor, los saldos agregados por HorseBuyer y por
+    usuario aplicados en bloque, y un único UPDATE de estado.
+
+    Cada sentencia vuelve a exigir que la cuota siga PENDIENTE: los IDs se
+    leyeron en otra transacción y una cuota pagada desde entonces no debe
+    marcarse como vencida ni volver a cargarse en el saldo. Devuelve la
+    cantidad de cuotas marcadas.
+    """
+    pending_amount = BuyerInstallment.amount - BuyerInstallment.amount_paid
+    in_chunk = and_(
+        BuyerInstallment.id.in_(ids),
+        BuyerInstallment.status
+        == BuyerInstallment.status_literal(PaymentStatus.PENDING),
+    )
+
+    db.execute(
+        insert(BalanceEntry).from_select(
+            ["user_id", "horse_buyer_id", "amount", "concept", "buyer_installment_id"],
+            select(
+                HorseBuyer.buyer_id,
+                BuyerInstallment.horse_buyer_id,
+                -pending_amount,
+                literal("Cuota vencida", String),
+                BuyerInstallment.id,
+            )
+            .join(HorseBuyer, HorseBuyer.id == BuyerInstallment.horse_buyer_id)
+            .where(in_chunk),
+        )
+    )
+
+    horse_buyer_deltas = [
+        {"target_id": horse_buyer_id, "delta": -amount}
+        for horse_buyer_id, amount in db.execute(
+            select(BuyerInstallment.horse_buyer_id, func.sum(pending_amount))
+            .where(in_chunk)
+            .group_by(BuyerInstallment.horse_buyer_id)
+        )
+    ]
+    user_deltas = [
+        {"target_id": user_id, "delta": -amount}
+        for user_id, amount in db.execute(
+            select(HorseBuyer.buyer_id, func.sum(pending_amount))
+            .join(HorseBuyer, HorseBuyer.id == BuyerInstallment.horse_buyer_id)
+            .where(in_chunk)
+            .group_by(HorseBuyer.buyer_id)
+        )
+    ]
+    horse_ids = db.scalars(
+        select(HorseBuyer.horse_id)
+        .join(BuyerInstallment, BuyerInstallment.horse_buyer_id == HorseBuyer.id)
+        .where(in_chunk)
+        .distinct()
+    ).all()
+    invalidate(
+        db, horses=horse_ids, users=[delta["target_id"] for delta in user_deltas]
+    )
+    connection = db.connection()
+    for table, deltas in (
+        (HorseBuyer.__table__, horse_buyer_deltas),
+        (User.__table__, user_deltas),
+    ):
+        if deltas:
+            connection.execute(
+                update(table)
+                .where(table.c.id == bindparam("target_id"))
+                .values(balance=table.c.balance + bindparam("delta")),
+                deltas,
+            )
+
+    return db.execute(
+        update(BuyerInstallment)
+        .where(in_chunk)
+        .values(status=PaymentStatus.OVERDUE, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def _pending_due_before(current_time: datetime) -> list:
+    return [
+        Installment.due_date < current_time,
+        BuyerInstallment.status
+        == BuyerInstallment.status_literal(PaymentStatus.PENDING),
+    ]
+
+
+def overdue_chunk_query(current_time: datetime, after_id: int = 0):
+    """
+    IDs del siguiente bloque de cuotas pendientes vencidas antes de
+    `current_time`, a partir de la cuota `after_id` (excluida). Recorre
+    `ix_buyer_installments_status_id` en orden de ID, de modo que cada bloque
+    retoma donde terminó el anterior y el LIMIT corta el recorrido sin leer
+    las cuotas pagadas.
+    """
+    return (
+        select(BuyerInstallment.id)
+        .join(Installment)
+        .where(*_pending_due_before(current_time), BuyerInstallment.id > after_id)
+        .order_by(BuyerInstallment.id)
+        .limit(OVERDUE_CHUNK_SIZE)
+    )
+
+
+def incremental_overdue_query(
+    current_time: datetime, since: datetime, after_id: int = 0
+):
+    """
+    IDs del siguiente bloque de cuotas pendientes vencidas antes de
+    `current_time` que vencieron o se crearon (p. ej. compradores agregados)
+    desde `since`, a partir de la cuota `after_id` (excluida). Son dos
+    consultas unidas con UNION, cada una resuelta con su índice
+    (`ix_installments_due_date`, `ix_buyer_installments_created_at`): un OR
+    entre columnas de ambas tablas obligaría a recorrerlas completas.
+    """
+    status = BuyerInstallment.status == BuyerInstallment.status_literal(
+        PaymentStatus.PENDING
+    )
+    window = union(
+        select(BuyerInstallment.id)
+        .join(Installment)
+        .where(*_pending_due_before(current_time), Installment.due_date >= since),
+        # Sin JOIN, para que la búsqueda parta de `created_at` y el vencimiento
+        # se verifique por clave primaria
+        select(BuyerInstallment.id).where(
+            BuyerInstallment.created_at >= since,
+            status,
+            select(Installment.id)
+            .where(
+                Installment.id == BuyerInstallment.installment_id,
+                Installment.due_date < current_time,
+            )
+            .exists(),
+        ),
+    ).subquery()
+    # El corte por ID va afuera del UNION: dentro de cada rama, SQLite
+    # preferiría `ix_buyer_installments_status_id` a `created_at`
+    return (
+        select(window.c.id)
+        .where(window.c.id > after_id)
+        .order_by(window.c.id)
+        .limit(OVERDUE_CHUNK_SIZE)
+    )
+
+
+def _overdue_chunks(db: Session, chunk_query) -> Iterator[List[int]]:
+    """
+    Bloques de IDs de `chunk_query(after_id)`. Cada bloque se lee en la
+    transacción que lo procesa, después de confirmar el anterior.
+    """
+    last_id = 0
+    while True:
+        ids = list(db.scalars(chunk_query(last_id)))
+        if not ids:
+            return
+        last_id = ids[-1]
+        yield ids
+
+
+def check_overdue_installments(full: bool = False) -> dict:
     """
     Verifica las cuotas pendientes que han pasado su fecha de vencimiento y las marca como vencidas.
     Además, ajusta el balance de los compradores correspondientes.
+
+    Sólo revisa las cuotas que vencieron (o se crearon) desde la marca de
+    avance persistida de la ejecución anterior, salvo que `full` sea True.
+    Procesa las cuotas en bloques de OVERDUE_CHUNK_SIZE, cada uno en su propia
+    transacción, y devuelve las estadísticas de la ejecución.
     """
     db_generator = get_db()
     db = next(db_generator)
+    stats = {"since": None, "high_water_mark": None, "materialized": 0, "processed": 0}
     try:
         current_time = datetime.utcnow()
-        pending_installments = (
-            db.query(BuyerInstallment)
-            .join(Installment)
-            .filter(
-                Installment.due_date < current_time,
-                BuyerInstallment.status == PaymentStatus.PENDING,
-            )
-            .all()
+        checkpoint = db.get(JobCheckpoint, CHECKPOINT_NAME) or JobCheckpoint(
+            name=CHECKPOINT_NAME
         )
+        since = None if full else checkpoint.high_water_mark
+        stats["since"] = since
+
+        # Las cuotas virtuales vencidas se persisten para marcarlas como vencidas
+        stats["materialized"] = materialize_due_installments(db, current_time)
+        db.commit()
 
-        for installment in pending_installments:
-            installment.status = PaymentStatus.OVERDUE
-            # Calcular el monto pendiente
-            pending_amount = installment.amount - installment.amount_paid
-            horse_buyer = installment.horse_buyer
-            horse_buyer.balance -= pending_amount
-            # Actualizar el balance total del usuario
-            user = horse_buyer.buyer
-            user.update_total_balance()
-            logger.info(
-                f"Cuota ID {installment.id} marcada como VENCIDA y se dedujo {pending_amount} del comprador ID {horse_buyer.buyer_id}"
+        if since is None:
+            chunks = _overdue_chunks(
+                db, lambda after_id: overdue_chunk_query(current_time, after_id)
+            )
+        else:
+            chunks = _overdue_chunks(
+                db,
+                lambda after_id: incremental_overdue_query(
+                    current_time, since, after_id
+                ),
             )
+        for ids in chunks:
+            marked = _mark_chunk_overdue(db, ids)
+            db.commit()
+            stats["processed"] += marked
+            logger.info(f"{marked} cuotas marcadas como VENCIDAS")
 
+        checkpoint.high_water_mark = current_time
+        db.merge(checkpoint)
         db.commit()
-        logger.info("Verificación y actualización de cuotas vencidas completada.")
+        stats["high_water_mark"] = current_time
+        logger.info(
+            f"Verificación y actualización de cuotas vencidas completada: {stats['processed']} cuotas."
+        )
     except Exception as e:
         logger.error(f"Error al verificar cuotas vencidas: {str(e)}")
         db.rollback()
+        raise
     finally:
         db.close()
+    return stats
+
+
+# ----------------------
+# Ejecución en segundo plano
+# ----------------------
+
+# Un solo hilo de trabajo: las verificaciones nunca se ejecutan en paralelo
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="overdue-checker")
+_jobs: Dict[str, dict] = {}
+_jobs_lock = threading.Lock()
+_stop_event = threading.Event()
+_scheduler_thread: Optional[threading.Thread] = None
+
+
+def _run_job(job: dict) -> None:
+    job["status"] = "running"
+    job["started_at"] = datetime.utcnow()
+    start = time.perf_counter()
+    try:
+        job.update(check_overdue_installments(full=job["full"]))
+        job["status"] = "done"
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
+    finally:
+        job["finished_at"] = datetime.utcnow()
+        job["duration_seconds"] = round(time.perf_counter() - start, 4)
+
+
+def submit_overdue_check(trigger: str = "manual", full: bool = False) -> dict:
+    """
+    Encola una verificación de cuotas vencidas y devuelve el registro del
+    trabajo, que se actualiza a medida que avanza.
+    """
+    job = {
+        "id": uuid.uuid4().hex,
+        "trigger": trigger,
+        "full": full,
+        "status": "queued",
+        "queued_at": datetime.utcnow(),
+    }
+    with _jobs_lock:
+        _jobs[job["id"]] = job
+        while len(_jobs) > MAX_TRACKED_JOBS:
+            _jobs.pop(next(iter(_jobs)))
+    _executor.submit(_run_job, job)
+    return dict(job)
+
+
+def get_overdue_check_job(job_id: str) -> Optional[dict]:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    return dict(job) if job else None
+
+
+def _scheduler_loop(interval: int) -> None:
+    while not _stop_event.is_set():
+        submit_overdue_check(trigger="scheduler")
+        _stop_event.wait(interval)
+
+
+def start_overdue_scheduler(interval: int = OVERDUE_CHECK_INTERVAL) -> None:
+    """
+    Inicia el hilo que encola una verificación al arrancar y luego cada
+    `interval` segundos.
+    """
+    global _scheduler_thread
+    if _scheduler_thread is not None and _scheduler_thread.is_alive():
+        return
+    _stop_event.clear()
+    _scheduler_thread = threading.Thread(
+        target=_scheduler_loop,
+        args=(interval,),
+        name="overdue-scheduler",
+        daemon=True,
+    )
+    _scheduler_thread.start()
+    logger.info(f"Verificación de cuotas vencidas programada cada {interval} segundos")
+
+
+def stop_overdue_scheduler() -> None:
+    _stop_event.set()
@@ -1,16 +1,44 @@
 # backend/prod/api/routes.py
 
-from fastapi import APIRouter, Depends, HTTPException, status, Response, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from .overdue_checker import (
-    check_overdue_installments,
-)  # Importa la función de verificación
+    get_overdue_check_job,
+    submit_overdue_check,
+)  # Verificación de cuotas vencidas en segundo plano
+from .cache import response_cache  # Caché de respuestas serializadas
+from .serialization import (
+    dumps,
+    json_response,
+    schema_columns,
+    schema_rows,
+)  # Serialización directa de listados
+from .export import (
+    ExportEntity,
+    ExportFormat,
+    MEDIA_TYPES,
+    export_rows,
+)  # Exportación completa en streaming
+from .statements import (
+    ARCHIVE_NAME,
+    get_statements_job,
+    job_dir,
+    submit_statements_job,
+)  # Estados de cuenta en PDF generados en segundo plano
+import hashlib
 import os
-from typing import List
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from functools import wraps
+from inspect import signature
+from typing import List, Optional, Union
 from . import crud, schemas
 from .models import *
 from .models import get_db  # Asegúrate de importar get_db desde models.py
+from .models import get_async_db  # Sesión asíncrona para el modo async
+from .settings import settings
 import logging
 
 router = APIRouter()
@@ -18,19 +46,175 @@ router = APIRouter()
 # Configuración del logger
 logger = logging.getLogger(__name__)
 
+# ----------------------
+# Funciones Auxiliares
+# ----------------------
+
+
+def _attach_virtual_installments(
+    parents, virtual, key: str, collection: str = "installments"
+):
+    """
+    Agrega las cuotas virtuales (modo lazy) a la colección `collection` de
+    cada esquema en `parents`, emparejando `parent.id` con `cuota.<key>`.
+    """
+    by_parent = {}
+    for buyer_installment in virtual:
+        by_parent.setdefault(getattr(buyer_installment, key), []).append(
+            schemas.VirtualBuyerInstallmentSchema.model_validate(buyer_installment)
+        )
+    for parent in parents:
+        getattr(parent, collection).extend(by_parent.get(parent.id, []))
+    return parents
+
+
+def _parse_csv(value: Optional[str]) -> Optional[set]:
+    if value is None:
+        return None
+    return {item.strip() for item in value.split(",") if item.strip()}
+
+
+def _parse_ids(value: str) -> List[int]:
+    try:
+        return [int(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail="'ids' debe ser una lista de enteros"
+        )
+
+
+def _not_modified(
+    request: Request, response: Response, db: Session, *models
+) -> Optional[Response]:
+    """
+    Agrega `ETag` y `Last-Modified` derivados de la versión de las tablas de
+    `models` y de los parámetros de la consulta. Si el cliente ya tiene esa
+    versión (`If-None-Match`), devuelve una respuesta 304 para que la ruta
+    la retorne sin consultar ni serializar los datos.
+    """
+    version = crud.get_table_version(db, *models)
+    digest = hashlib.sha1(repr((version, str(request.url.query))).encode()).hexdigest()
+    headers = {"ETag": f'W/"{digest}"', "Cache-Control": "no-cache"}
+    last_modified = max((value for value in version[::2] if value), default=None)
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            last_modified.replace(tzinfo=timezone.utc), usegmt=True
+        )
+    response.headers.update(headers)
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or headers["ETag"] in (
+        tag.strip() for tag in if_none_match.split(",")
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
+
+
+def read_route(path: str, **route_kwargs):
+    """
+    Registra una ruta GET de lectura frecuente. La respuesta se valida
+    contra `response_model` dentro de la sesión, para que ninguna carga
+    diferida ocurra fuera de ella, y la sesión se libera antes de responder:
+    FastAPI valida la respuesta de una ruta síncrona en otro hilo del pool
+    de anyio, y con más clientes que hilos la conexión quedaba tomada
+    mientras esperaba uno. En modo async (`settings.db_async`) la ruta se
+    expone como `async def` con una AsyncSession y ejecuta el mismo cuerpo
+    mediante `AsyncSession.run_sync`, sin ocupar un hilo del pool.
+    """
+
+    def decorator(handler):
+        response_model = route_kwargs.get("response_model")
+        adapter = TypeAdapter(response_model) if response_model is not None else None
+
+        def run(session: Session, kwargs: dict):
+            result = handler(db=session, **kwargs)
+            if adapter is None or isinstance(result, Response):
+                return result
+            return adapter.validate_python(result, from_attributes=True)
+
+        if not settings.db_async:
+
+            @wraps(handler)
+            def sync_endpoint(db: Session, **kwargs):
+                try:
+                    return run(db, kwargs)
+                finally:
+                    db.close()
+
+            router.get(path, **route_kwargs)(sync_endpoint)
+            return handler
+
+        async def endpoint(db, **kwargs):
+            return await db.run_sync(run, kwargs)
+
+        # Misma firma que la ruta síncrona, con la sesión asíncrona como `db`
+        handler_signature = signature(handler)
+        endpoint.__signature__ = handler_signature.replace(
+            parameters=[
+                (
+                    parameter.replace(default=Depends(get_async_db))
+                    if parameter.name == "db"
+                    else parameter
+                )
+                for parameter in handler_signature.parameters.values()
+            ]
+        )
+        endpoint.__name__ = handler.__name__
+        endpoint.__doc__ = handler.__doc__
+        router.get(path, **route_kwargs)(endpoint)
+        return handler
+
+    return decorator
+
+
+def _set_next_cursor(response: Response, items, limit: int, key) -> None:
+    """
+    Expone el cursor de la página siguiente en el encabezado `X-Next-Cursor`
+    cuando la página está completa.
+    """
+    if items and len(items) == limit:
+        response.headers["X-Next-Cursor"] = crud.encode_cursor(key(items[-1]))
+
+
 # ----------------------
 # Rutas para Usuarios
 # ----------------------
 
 
 # Obtener todos los usuarios
-@router.get("/users/", response_model=List[schemas.UserSchema])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_users(db, skip=skip, limit=limit)
+@read_route("/users/", response_model=List[schemas.UserSchema])
+def read_users(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    ids: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Listar usuarios. Con `ids` (separados por coma) devuelve esos usuarios en
+    el orden pedido, en una sola consulta. Responde 304 si `If-None-Match`
+    coincide con el `ETag` actual.
+    """
+    cached, lookup = response_cache.lookup(request, ("users",))
+    if cached:
+        return cached
+    not_modified = _not_modified(request, response, db, User)
+    if not_modified:
+        return not_modified
+    columns = schema_columns(schemas.UserSchema, User)
+    if ids is not None:
+        users = crud.get_by_ids(db, User, _parse_ids(ids), columns=columns)
+    else:
+        users = crud.get_users(db, skip=skip, limit=limit, after=after, columns=columns)
+        _set_next_cursor(response, users, limit, lambda user: (user.id,))
+    return response_cache.store(
+        lookup, dumps(schema_rows(users, schemas.UserSchema)), response.headers
+    )
 
 
 # Obtener un usuario por ID
-@router.get("/users/{user_id}", response_model=schemas.UserSchema)
+@read_route("/users/{user_id}", response_model=schemas.UserSchema)
 def read_user(user_id: int, db: Session = Depends(get_db)):
     db_user = crud.get_user(db, user_id=user_id)
     if not db_user:
@@ -75,18 +259,118 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
 
 
 # Obtener todos los caballos
-@router.get("/horses/", response_model=List[schemas.HorseSchema])
-def read_horses(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_horses(db, skip=skip, limit=limit)
+@read_route("/horses/", response_model=List[schemas.HorseSchema])
+def read_horses(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    ids: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Listar caballos. Con `ids` (separados por coma) devuelve esos caballos en
+    el orden pedido, en una sola consulta. Responde 304 si `If-None-Match`
+    coincide con el `ETag` actual.
+    """
+    cached, lookup = response_cache.lookup(request, ("horses",))
+    if cached:
+        return cached
+    not_modified = _not_modified(request, response, db, Horse)
+    if not_modified:
+        return not_modified
+    columns = schema_columns(schemas.HorseSchema, Horse)
+    if ids is not None:
+        horses = crud.get_by_ids(db, Horse, _parse_ids(ids), columns=columns)
+    else:
+        horses = crud.get_horses(
+            db, skip=skip, limit=limit, after=after, columns=columns
+        )
+        _set_next_cursor(response, horses, limit, lambda horse: (horse.id,))
+    return response_cache.store(
+        lookup, dumps(schema_rows(horses, schemas.HorseSchema)), response.headers
+    )
 
 
 # Obtener un caballo por ID con detalles
-@router.get("/horses/{horse_id}", response_model=schemas.HorseDetailSchema)
-def get_horse(horse_id: int, db: Session = Depends(get_db)):
-    db_horse = crud.get_horse(db, horse_id=horse_id)
+@read_route("/horses/{horse_id}", response_model=schemas.HorseDetailSchema)
+def get_horse(
+    horse_id: int,
+    request: Request,
+    response: Response,
+    include: Optional[str] = None,
+    fields: Optional[str] = None,
+    names: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Obtener un caballo con sus compradores, transacciones y cuotas.
+
+    `include` limita las colecciones cargadas (separadas por coma, entre
+    `buyers`, `buyers.installments`, `transactions` e `installments`); las
+    demás se devuelven vacías. `fields` limita los campos de la respuesta.
+    Con `names=true` compradores y transacciones incluyen `buyer_name`,
+    `user_name` y `horse_name`.
+    """
+    cached, lookup = response_cache.lookup(
+        request, (f"horse:{horse_id}",) + (("users",) if names else ())
+    )
+    if cached:
+        return cached
+    sections = _parse_csv(include)
+    if sections is not None and not sections <= set(crud.HORSE_DETAIL_SECTIONS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Secciones válidas: {', '.join(crud.HORSE_DETAIL_SECTIONS)}",
+        )
+    selected_fields = _parse_csv(fields)
+    if selected_fields is not None and not selected_fields <= set(
+        schemas.HorseDetailSchema.model_fields
+    ):
+        raise HTTPException(status_code=400, detail="Campos inválidos en 'fields'")
+    db_horse = crud.get_horse(db, horse_id=horse_id, include=sections, names=names)
     if not db_horse:
         raise HTTPException(status_code=404, detail="Caballo no encontrado")
-    return db_horse
+    horse = schemas.HorseDetailSchema.model_validate(db_horse)
+    if db_horse.lazy_installments and (
+        sections is None or sections & {"buyers.installments", "installments"}
+    ):
+        virtual = crud.get_virtual_buyer_installments(
+            db, HorseBuyer.horse_id == horse_id
+        )
+        _attach_virtual_installments(horse.buyers, virtual, "horse_buyer_id")
+        _attach_virtual_installments(
+            horse.installments, virtual, "installment_id", "buyer_installments"
+        )
+    return response_cache.store(
+        lookup, horse.model_dump_json(include=selected_fields), response.headers
+    )
+
+
+# Informe mensual de un caballo
+@router.get("/horses/{horse_id}/report", response_model=schemas.HorseReportSchema)
+def get_horse_report(
+    horse_id: int,
+    month: Optional[int] = Query(None, ge=1, le=12),
+    year: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Obtener en una sola respuesta el informe del período (`month`/`year`, por
+    defecto el mes actual): la cuota de cada comprador, las transacciones, la
+    parte de cada comprador en cada transacción y los totales.
+    """
+    current_date = datetime.utcnow()
+    report = crud.get_horse_report(
+        db,
+        horse_id=horse_id,
+        mes=month or current_date.month,
+        año=year or current_date.year,
+    )
+    if report is None:
+        raise HTTPException(status_code=404, detail="Caballo no encontrado")
+    return report
 
 
 # Crear un nuevo caballo con compradores
@@ -104,6 +388,22 @@ def create_horse(horse: schemas.HorseCreateSchema, db: Session = Depends(get_db)
         raise HTTPException(status_code=400, detail=str(ve))
 
 
+# Crear muchos caballos con compradores en una sola transacción
+@router.post(
+    "/horses/bulk",
+    response_model=schemas.HorseBulkResultSchema,
+    status_code=status.HTTP_201_CREATED,
+)
+def create_horses_bulk(
+    payload: schemas.HorseBulkCreateSchema, db: Session = Depends(get_db)
+):
+    results = crud.create_horses_bulk(
+        db=db, horses_data=[horse.dict() for horse in payload.horses]
+    )
+    created = sum(1 for result in results if result["success"])
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
 # Actualizar un caballo existente
 @router.put("/horses/{horse_id}", response_model=schemas.HorseDetailSchema)
 def update_horse(
@@ -135,18 +435,60 @@ def delete_horse(horse_id: int, db: Session = Depends(get_db)):
 
 
 # Obtener todos los compradores de caballo
-@router.get("/horse-buyers/", response_model=List[schemas.HorseBuyerSchema])
-def read_horse_buyers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_horse_buyers(db, skip=skip, limit=limit)
+@read_route(
+    "/horse-buyers/",
+    response_model=List[
+        Union[schemas.HorseBuyerSummarySchema, schemas.HorseBuyerSchema]
+    ],
+)
+def read_horse_buyers(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    installments: bool = False,
+    names: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Lista los compradores de caballos con un resumen de sus cuotas y los
+    nombres del comprador y del caballo. Con `installments=true` devuelve en
+    cambio el calendario completo anidado (con nombres sólo si `names=true`).
+    """
+    if not installments:
+        summaries = crud.get_horse_buyer_summaries(
+            db, skip=skip, limit=limit, after=after
+        )
+        _set_next_cursor(response, summaries, limit, lambda hb: (hb["id"],))
+        return summaries
+    db_horse_buyers = crud.get_horse_buyers(
+        db, skip=skip, limit=limit, after=after, names=names
+    )
+    _set_next_cursor(response, db_horse_buyers, limit, lambda hb: (hb.id,))
+    virtual = crud.get_virtual_buyer_installments(
+        db, HorseBuyer.id.in_([horse_buyer.id for horse_buyer in db_horse_buyers])
+    )
+    return _attach_virtual_installments(
+        [schemas.HorseBuyerSchema.model_validate(hb) for hb in db_horse_buyers],
+        virtual,
+        "horse_buyer_id",
+    )
 
 
 # Obtener un comprador de caballo por ID
-@router.get("/horse-buyers/{horse_buyer_id}", response_model=schemas.HorseBuyerSchema)
-def read_horse_buyer(horse_buyer_id: int, db: Session = Depends(get_db)):
-    horse_buyer = crud.get_horse_buyer(db, horse_buyer_id=horse_buyer_id)
+@read_route("/horse-buyers/{horse_buyer_id}", response_model=schemas.HorseBuyerSchema)
+def read_horse_buyer(
+    horse_buyer_id: int, names: bool = False, db: Session = Depends(get_db)
+):
+    horse_buyer = crud.get_horse_buyer(db, horse_buyer_id=horse_buyer_id, names=names)
     if not horse_buyer:
         raise HTTPException(status_code=404, detail="HorseBuyer no encontrado")
-    return horse_buyer
+    virtual = crud.get_virtual_buyer_installments(db, HorseBuyer.id == horse_buyer_id)
+    return _attach_virtual_installments(
+        [schemas.HorseBuyerSchema.model_validate(horse_buyer)],
+        virtual,
+        "horse_buyer_id",
+    )[0]
 
 
 # Crear un comprador de caballo
@@ -212,9 +554,62 @@ def create_transaction(
 
 
 # Obtener todas las transacciones
-@router.get("/transactions/", response_model=List[schemas.TransactionSchema])
-def read_transactions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_transactions(db, skip=skip, limit=limit)
+@read_route("/transactions/", response_model=List[schemas.TransactionSchema])
+def read_transactions(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    horse_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    transaction_type: Optional[schemas.TransactionType] = Query(None, alias="type"),
+    mes: Optional[int] = None,
+    año: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    names: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Obtener transacciones, opcionalmente filtradas por caballo, usuario,
+    tipo, período (`mes`/`año`) o rango de fechas (`date_from` inclusive,
+    `date_to` exclusive). Con `names=true` incluyen `user_name` y `horse_name`.
+    Responde 304 si `If-None-Match` coincide con el `ETag` actual.
+    """
+    not_modified = _not_modified(
+        request,
+        response,
+        db,
+        Transaction,
+        InstallmentPayment,
+        *((User, Horse) if names else ()),
+    )
+    if not_modified:
+        return not_modified
+    transactions = crud.get_transaction_rows(
+        db,
+        skip=skip,
+        limit=limit,
+        after=after,
+        horse_id=horse_id,
+        user_id=user_id,
+        transaction_type=(
+            TransactionType(transaction_type.value) if transaction_type else None
+        ),
+        mes=mes,
+        año=año,
+        date_from=date_from,
+        date_to=date_to,
+        names=names,
+    )
+    _set_next_cursor(
+        response,
+        transactions,
+        limit,
+        lambda transaction: (transaction["date"], transaction["id"]),
+    )
+    return json_response(dumps(transactions), response.headers)
 
 
 # Actualizar una transacción existente
@@ -252,24 +647,146 @@ def delete_transaction(transaction_id: int, db: Session = Depends(get_db)):
 
 @router.post(
     "/installments/check-overdue/",
-    status_code=status.HTTP_200_OK,
+    response_model=schemas.OverdueCheckJobSchema,
+    status_code=status.HTTP_202_ACCEPTED,
     summary="Verificar y actualizar cuotas vencidas manualmente",
-    description="Ejecuta la verificación de cuotas vencidas y actualiza los balances de los compradores.",
+    description="Encola la verificación de cuotas vencidas y devuelve el trabajo para consultar su avance.",
 )
-def manual_check_overdue_installments(db: Session = Depends(get_db)):
+def manual_check_overdue_installments(full: bool = False):
     """
     Endpoint para ejecutar manualmente la verificación de cuotas vencidas.
+    Con `full=true` revisa todas las cuotas, no sólo las nuevas.
     """
-    try:
-        check_overdue_installments()
-        return {"message": "Verificación de cuotas vencidas ejecutada exitosamente."}
-    except Exception as e:
-        logger.error(
-            f"Error al ejecutar verificación manual de cuotas vencidas: {str(e)}"
-        )
+    return submit_overdue_check(trigger="manual", full=full)
+
+
+@router.get(
+    "/installments/check-overdue/{job_id}",
+    response_model=schemas.OverdueCheckJobSchema,
+)
+def read_overdue_check_job(job_id: str):
+    job = get_overdue_check_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Verificación no encontrada")
+    return job
+
+
+# ----------------------
+# Caché de Respuestas
+# ----------------------
+
+
+@router.get("/cache/stats", response_model=schemas.ResponseCacheStatsSchema)
+def read_cache_stats():
+    """
+    Obtener los contadores de la caché de respuestas (aciertos, fallos e
+    invalidaciones).
+    """
+    return response_cache.stats()
+
+
+# ----------------------
+# Exportación
+# ----------------------
+
+
+@router.get("/export/{entity}")
+def export_entity(
+    entity: ExportEntity,
+    export_format: ExportFormat = Query(ExportFormat.CSV, alias="format"),
+    horse_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    """
+    Exportar en streaming el historial completo de `transactions`,
+    `buyer_installments` o `installment_payments` como CSV o NDJSON,
+    opcionalmente filtrado por caballo, usuario o rango de fechas
+    (`date_from` inclusive, `date_to` exclusive).
+    """
+    return StreamingResponse(
+        export_rows(
+            entity,
+            export_format,
+            horse_id=horse_id,
+            user_id=user_id,
+            date_from=date_from,
+            date_to=date_to,
+        ),
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{entity.value}.{export_format.value}"'
+            )
+        },
+    )
+
+
+# ----------------------
+# Estados de Cuenta en PDF
+# ----------------------
+
+
+@router.post(
+    "/statements/",
+    response_model=schemas.StatementJobSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def generate_statements(
+    month: Optional[int] = Query(None, ge=1, le=12), year: Optional[int] = None
+):
+    """
+    Encola la generación de los estados de cuenta en PDF de todos los
+    compradores de todos los caballos para el período (por defecto el mes
+    actual) y devuelve el trabajo para consultar su avance.
+    """
+    current_date = datetime.utcnow()
+    return submit_statements_job(
+        mes=month or current_date.month, año=year or current_date.year
+    )
+
+
+@router.get("/statements/{job_id}", response_model=schemas.StatementJobSchema)
+def read_statements_job(job_id: str):
+    job = get_statements_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
+
+
+@router.get("/statements/{job_id}/download")
+def download_statements(job_id: str):
+    """
+    Descargar un archivo ZIP con todos los estados de cuenta del trabajo.
+    """
+    job = get_statements_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    if job["status"] != "done":
         raise HTTPException(
-            status_code=500, detail="Error al ejecutar la verificación."
+            status_code=409, detail="Los estados de cuenta todavía no están listos"
         )
+    return FileResponse(
+        os.path.join(job_dir(job), ARCHIVE_NAME),
+        media_type="application/zip",
+        filename=f"estados_de_cuenta_{job['mes']:02d}_{job['año']}.zip",
+    )
+
+
+@router.get("/statements/{job_id}/files/{filename}")
+def download_statement(job_id: str, filename: str):
+    """
+    Descargar el estado de cuenta en PDF de un comprador.
+    """
+    job = get_statements_job(job_id)
+    if not job or filename not in job["files"]:
+        raise HTTPException(status_code=404, detail="Estado de cuenta no encontrado")
+    return FileResponse(
+        os.path.join(job_dir(job), filename),
+        media_type="application/pdf",
+        filename=filename,
+    )
 
 
 # ----------------------
@@ -309,6 +826,38 @@ def pay_installment(installment_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Error al pagar la cuota")
 
 
+@router.post(
+    "/horse-buyers/{horse_buyer_id}/installments/{installment_id}/pay",
+    response_model=schemas.BuyerInstallmentSchema,
+    status_code=status.HTTP_200_OK,
+)
+def pay_buyer_installment(
+    horse_buyer_id: int, installment_id: int, db: Session = Depends(get_db)
+):
+    """
+    Pagar la cuota de un comprador identificada por comprador y cuota. Sirve
+    también para cuotas virtuales (modo lazy), que se materializan al pagarse.
+    """
+    try:
+        buyer_installment = crud.materialize_buyer_installment(
+            db, horse_buyer_id=horse_buyer_id, installment_id=installment_id
+        )
+        if not buyer_installment:
+            raise HTTPException(status_code=404, detail="Installment not found")
+
+        if buyer_installment.status == PaymentStatus.PAID:
+            raise HTTPException(status_code=400, detail="Installment already paid")
+
+        crud.process_payment(buyer_installment, db)
+
+        return buyer_installment
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error al pagar la cuota: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error al pagar la cuota")
+
+
 # ----------------------
 # Endpoint para Registrar PAGO (Administración)
 # ----------------------
@@ -348,7 +897,7 @@ def create_pago(
 # ----------------------
 
 
-@router.get("/users/{user_id}/balance", response_model=schemas.BuyerBalanceDetailSchema)
+@read_route("/users/{user_id}/balance", response_model=schemas.BuyerBalanceDetailSchema)
 def get_user_balance_detail(user_id: int, db: Session = Depends(get_db)):
     """
     Obtener el detalle del saldo de un usuario, incluyendo balances individuales de cada HorseBuyer.
@@ -366,9 +915,51 @@ def get_user_balance_detail(user_id: int, db: Session = Depends(get_db)):
         )
 
 
+@read_route("/users/{user_id}/summary", response_model=schemas.UserSummarySchema)
+def get_user_summary(
+    user_id: int,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Obtener en una sola respuesta las participaciones del usuario con los
+    totales de cuotas por caballo y una página de sus transacciones (las que
+    registró y las de sus caballos), paginada con `skip`/`limit` o `after`.
+    """
+    summary = crud.get_user_summary(db, user_id, skip=skip, limit=limit, after=after)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    _set_next_cursor(
+        response,
+        summary["transactions"],
+        limit,
+        lambda transaction: (transaction.date, transaction.id),
+    )
+    return summary
+
+
+@router.get(
+    "/users/{user_id}/balance/history",
+    response_model=List[schemas.BalanceEntrySchema],
+)
+def get_user_balance_history(
+    user_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+):
+    """
+    Obtener los movimientos del libro mayor de balances de un usuario, del más
+    reciente al más antiguo.
+    """
+    if not crud.get_user(db, user_id=user_id):
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    return crud.get_balance_entries(db, user_id=user_id, skip=skip, limit=limit)
+
+
 @router.get(
     "/horse-buyers/{horse_buyer_id}/installments",
-    response_model=List[schemas.BuyerInstallmentSchema],
+    response_model=List[schemas.AnyBuyerInstallmentSchema],
 )
 def get_installments(
     horse_buyer_id: int,
@@ -391,6 +982,13 @@ def get_installments(
         .filter(Installment.mes == month, Installment.año == year)
         .all()  # Retrieve all matching installments
     )
+    # Cuotas todavía no materializadas (modo lazy)
+    installments += crud.get_virtual_buyer_installments(
+        db,
+        HorseBuyer.id == horse_buyer_id,
+        Installment.mes == month,
+        Installment.año == year,
+    )
     return installments
 
 
@@ -403,4 +1001,10 @@ def get_installment(installment_id: int, db: Session = Depends(get_db)):
     db_installment = crud.get_installment(db, installment_id=installment_id)
     if not db_installment:
         raise HTTPException(status_code=404, detail="Installment not found")
-    return db_installment
+    virtual = crud.get_virtual_buyer_installments(db, Installment.id == installment_id)
+    return _attach_virtual_installments(
+        [schemas.InstallmentSchema.model_validate(db_installment)],
+        virtual,
+        "installment_id",
+        "buyer_installments",
+    )[0]
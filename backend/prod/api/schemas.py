@@ -1,7 +1,7 @@
 # backend/prod/api/schemas.py
 
-from pydantic import BaseModel, Field, EmailStr, ConfigDict, root_validator
-from typing import List, Optional, Dict
+from pydantic import BaseModel, Field, EmailStr, ConfigDict, model_validator
+from typing import List, Optional, Dict, Union
 from datetime import datetime
 from enum import Enum
 
@@ -73,6 +73,24 @@ class HorseCreateSchema(HorseBaseSchema):
     buyers_data: List[dict] = Field(..., example=[{"buyer_id": 1, "percentage": 50.0}])
 
 
+class HorseBulkCreateSchema(BaseModel):
+    horses: List[HorseCreateSchema]
+
+
+class HorseBulkItemResultSchema(BaseModel):
+    index: int  # Posición del caballo en la solicitud
+    name: str
+    success: bool
+    horse_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class HorseBulkResultSchema(BaseModel):
+    created: int
+    failed: int
+    results: List[HorseBulkItemResultSchema]
+
+
 class HorseUpdateSchema(BaseModel):
     name: Optional[str] = None
     information: Optional[str] = None
@@ -107,11 +125,40 @@ class HorseBuyerSchema(HorseBuyerBaseSchema):
     join_date: datetime
     updated_at: datetime
     balance: float
-    installments: List["BuyerInstallmentSchema"] = []  # Forward reference
+    buyer_name: Optional[str] = None
+    horse_name: Optional[str] = None
+    installments: List["AnyBuyerInstallmentSchema"] = []  # Forward reference
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Representación liviana para listados: sin el calendario de cuotas anidado
+class HorseBuyerSummarySchema(HorseBuyerBaseSchema):
+    id: int
+    horse_id: int
+    buyer_id: int
+    join_date: datetime
+    updated_at: datetime
+    balance: float
+    buyer_name: Optional[str] = None
+    horse_name: Optional[str] = None
+    horse_total_value: Optional[float] = None
+    installments_count: int
+    paid_installments: int
+    overdue_installments: int
+    pending_installments: int  # Pendientes y parciales
+    paid_amount: float = 0.0  # Monto pagado (incluye pagos parciales)
+    overdue_amount: float = 0.0  # Monto aún no pagado de cuotas vencidas
+    outstanding_amount: float  # Monto aún no pagado (incluye vencidas)
 
     model_config = ConfigDict(from_attributes=True)
 
 
+# Participación de un usuario en un caballo, para su resumen
+class UserHorseShareSchema(HorseBuyerSummarySchema):
+    share_value: float  # Parte del valor del caballo según el porcentaje
+
+
 # Installment Schemas
 class InstallmentBaseSchema(BaseModel):
     horse_id: int
@@ -137,7 +184,7 @@ class InstallmentSchema(InstallmentBaseSchema):
     updated_at: datetime
     mes: int
     año: int
-    buyer_installments: List["BuyerInstallmentSchema"] = []  # Forward reference
+    buyer_installments: List["AnyBuyerInstallmentSchema"] = []  # Forward reference
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -171,6 +218,15 @@ class BuyerInstallmentSchema(BuyerInstallmentBaseSchema):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Cuota de comprador todavía no materializada (modo lazy): sin ID
+class VirtualBuyerInstallmentSchema(BuyerInstallmentSchema):
+    id: None = None
+
+
+# Cuotas de las respuestas que pueden incluir cuotas virtuales
+AnyBuyerInstallmentSchema = Union[BuyerInstallmentSchema, VirtualBuyerInstallmentSchema]
+
+
 # Transaction Schemas
 class TransactionBaseSchema(BaseModel):
     type: TransactionType
@@ -187,7 +243,8 @@ class TransactionCreateSchema(TransactionBaseSchema):
     mes: int
     año: int
 
-    @root_validator(pre=True)
+    @model_validator(mode="before")
+    @classmethod
     def check_fields_based_on_type(cls, values):
         transaction_type = values.get("type")
         horse_id = values.get("horse_id")
@@ -221,7 +278,8 @@ class TransactionUpdateSchema(BaseModel):
     mes: Optional[int] = None
     año: Optional[int] = None
 
-    @root_validator(pre=True)
+    @model_validator(mode="before")
+    @classmethod
     def check_fields_based_on_type(cls, values):
         transaction_type = values.get("type")
         horse_id = values.get("horse_id")
@@ -246,6 +304,8 @@ class TransactionSchema(TransactionBaseSchema):
     date: datetime
     created_at: datetime
     updated_at: datetime
+    user_name: Optional[str] = None
+    horse_name: Optional[str] = None
     installment_payments: List["InstallmentPaymentSchema"] = []
     mes: int
     año: int
@@ -308,9 +368,116 @@ class BuyerBalanceDetailSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Schema para el Resumen de un Usuario
+class UserSummarySchema(BaseModel):
+    user: UserSchema
+    horses: List[UserHorseShareSchema] = []
+    paid_amount: float
+    overdue_amount: float
+    outstanding_amount: float
+    transactions: List[TransactionSchema] = []  # Página de transacciones
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Schema para Movimientos del Libro Mayor de Balances
+class BalanceEntrySchema(BaseModel):
+    id: int
+    user_id: int
+    horse_buyer_id: Optional[int] = None
+    amount: float
+    concept: Optional[str] = None
+    transaction_id: Optional[int] = None
+    buyer_installment_id: Optional[int] = None
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Schema para Ejecuciones de la Verificación de Cuotas Vencidas
+class OverdueCheckJobSchema(BaseModel):
+    id: str
+    trigger: str  # "scheduler" o "manual"
+    full: bool
+    status: str  # "queued", "running", "done" o "failed"
+    queued_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
+    since: Optional[datetime] = None
+    high_water_mark: Optional[datetime] = None
+    materialized: int = 0
+    processed: int = 0
+    error: Optional[str] = None
+
+
+# Schema para Trabajos de Generación de Estados de Cuenta
+class StatementJobSchema(BaseModel):
+    id: str
+    mes: int
+    año: int
+    status: str  # "queued", "running", "done" o "failed"
+    queued_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    total: int = 0  # Estados de cuenta a generar (uno por comprador)
+    completed: int = 0
+    failed: int = 0
+    files: List[str] = []
+    error: Optional[str] = None
+
+
+# Schema para los Contadores de la Caché de Respuestas
+class ResponseCacheStatsSchema(BaseModel):
+    entries: int
+    max_entries: int
+    hits: int
+    misses: int
+    hit_ratio: float
+    invalidations: int
+
+
+# Schemas para el Informe Mensual de un Caballo
+class HorseReportShareSchema(BaseModel):
+    transaction_id: int
+    amount: float  # Efecto en el balance del comprador (positivo a su favor)
+
+
+class HorseReportBuyerSchema(BaseModel):
+    horse_buyer_id: int
+    buyer_id: int
+    buyer_name: Optional[str] = None
+    percentage: float
+    balance: float
+    installments: List[AnyBuyerInstallmentSchema] = []
+    shares: List[HorseReportShareSchema] = []
+    installments_pending: float  # Monto aún no pagado de las cuotas del período
+    transactions_total: float  # Suma de `shares`
+    total: float  # balance + transactions_total - installments_pending
+
+
+class HorseReportTotalsSchema(BaseModel):
+    installments_amount: float
+    installments_paid: float
+    installments_pending: float
+    transactions_by_type: Dict[TransactionType, float]
+
+
+class HorseReportSchema(BaseModel):
+    horse_id: int
+    horse_name: str
+    mes: int
+    año: int
+    buyers: List[HorseReportBuyerSchema] = []
+    transactions: List[TransactionSchema] = []
+    totals: HorseReportTotalsSchema
+
+
 # Actualizar referencias para forward references
-HorseBuyerSchema.update_forward_refs()
-BuyerInstallmentSchema.update_forward_refs()
-InstallmentPaymentSchema.update_forward_refs()
-TransactionSchema.update_forward_refs()
-InstallmentSchema.update_forward_refs()
+HorseBuyerSchema.model_rebuild()
+BuyerInstallmentSchema.model_rebuild()
+VirtualBuyerInstallmentSchema.model_rebuild()
+InstallmentSchema.model_rebuild()
+InstallmentPaymentSchema.model_rebuild()
+TransactionSchema.model_rebuild()
+InstallmentSchema.model_rebuild()
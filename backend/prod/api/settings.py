@@ -0,0 +1,113 @@
+# backend/prod/api/settings.py
+
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Directorio de la aplicación (backend/prod); las rutas relativas de la
+# configuración se resuelven desde aquí y no desde el directorio de trabajo.
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Prefijo de las variables de entorno (p. ej. HORSES_DATABASE_URL)
+ENV_PREFIX = "HORSES_"
+
+# Archivo de configuración JSON, opcional
+SETTINGS_FILE = os.getenv(
+    f"{ENV_PREFIX}SETTINGS_FILE", os.path.join(BASE_DIR, "settings.json")
+)
+
+
+def _default_database_path() -> str:
+    """
+    Base SQLite por defecto: horses.db en el directorio de la aplicación.
+    Antes se usaba ./horses.db relativo al directorio de trabajo (la raíz del
+    repositorio con el lanzador main.py); si esa base existe y es otra, se
+    sigue usando para no cambiar de base en silencio.
+    """
+    path = os.path.join(BASE_DIR, "horses.db")
+    legacy_path = os.path.abspath("horses.db")
+    if os.path.exists(legacy_path) and not (
+        os.path.exists(path) and os.path.samefile(path, legacy_path)
+    ):
+        logger.warning(
+            f"Se usa la base {legacy_path} del directorio de trabajo (ubicación "
+            f"anterior) en lugar de {path}. Para usar la nueva ubicación, mover "
+            f"el archivo o indicar {ENV_PREFIX}DATABASE_URL."
+        )
+        return legacy_path
+    return path
+
+
+class Settings(BaseModel):
+    """
+    Configuración de la aplicación. Cada campo se toma, en orden de
+    prioridad, de la variable de entorno HORSES_<CAMPO>, del archivo de
+    configuración JSON (clave <campo>) o del valor por defecto.
+    """
+
+    model_config = ConfigDict(extra="ignore")
+
+    # Base de datos; sin URL se usa horses.db en el directorio de la aplicación
+    # (o ./horses.db si existe, ver _default_database_path).
+    # Acepta cualquier URL de SQLAlchemy, p. ej. postgresql+psycopg2://...
+    database_url: Optional[str] = None
+    db_echo: bool = False
+    # Modo async: las rutas de lectura frecuentes son `async def` y usan
+    # AsyncSession (requiere aiosqlite o asyncpg). Sin URL asíncrona se usa
+    # database_url con el driver asíncrono del motor.
+    db_async: bool = False
+    async_database_url: Optional[str] = None
+
+    # Pool de conexiones: una por hilo del pool de uvicorn/anyio (40 por
+    # defecto) más margen para los procesos en segundo plano.
+    db_pool_size: int = 40
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+
+    # Perfil de SQLite aplicado a cada conexión
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024
+    sqlite_foreign_keys: bool = True
+
+    # Modo de cuotas lazy (ver models.LAZY_INSTALLMENTS)
+    lazy_installments: bool = False
+    # Intervalo en segundos entre verificaciones automáticas de cuotas vencidas
+    overdue_check_interval: int = 3600
+    # Estados de cuenta en PDF
+    statements_dir: str = "statements"
+    statement_workers: int = 0  # 0: un proceso por CPU
+    statements_ttl: int = 86400  # Segundos que se conservan los generados
+    # Caché de respuestas (0 la desactiva)
+    response_cache_size: int = 512
+
+    @property
+    def sqlalchemy_database_url(self) -> str:
+        return self.database_url or "sqlite:///" + _default_database_path()
+
+    @property
+    def statements_path(self) -> str:
+        return os.path.join(BASE_DIR, self.statements_dir)
+
+
+def load_settings(path: str = SETTINGS_FILE) -> Settings:
+    values = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as settings_file:
+            values.update(json.load(settings_file))
+        logger.info(f"Configuración leída de {path}")
+    for name in Settings.model_fields:
+        value = os.getenv(f"{ENV_PREFIX}{name.upper()}")
+        if value is not None:
+            values[name] = value
+    return Settings(**values)
+
+
+settings = load_settings()
@@ -0,0 +1,365 @@
+# backend/prod/api/statements.py
+
+from sqlalchemy import select
+from . import crud, schemas
+from .models import get_db, Horse, HorseBuyer, Installment
+from .settings import settings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import logging
+import os
+import shutil
+import threading
+import uuid
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+# Directorio donde se escriben los estados de cuenta generados
+STATEMENTS_DIR = settings.statements_path
+
+# Procesos que renderizan PDFs en paralelo (por defecto, uno por CPU)
+STATEMENT_WORKERS = settings.statement_workers or None
+
+# Nombre del archivo comprimido con todos los estados de cuenta de un trabajo
+ARCHIVE_NAME = "estados_de_cuenta.zip"
+
+# Cantidad de ejecuciones recientes que se conservan para consulta
+MAX_TRACKED_JOBS = 50
+
+# Antigüedad a partir de la cual se borran los estados de cuenta generados
+STATEMENTS_TTL = timedelta(seconds=settings.statements_ttl)
+
+# ----------------------
+# Renderizado de PDF
+# ----------------------
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 en puntos
+MARGIN = 50
+FONTS = {"F1": "Helvetica", "F2": "Helvetica-Bold", "F3": "Courier"}
+
+
+def _pdf_string(text: str) -> bytes:
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return b"(" + escaped.encode("cp1252", errors="replace") + b")"
+
+
+def render_pdf(lines: List[Tuple[str, int, str]]) -> bytes:
+    """
+    Genera un PDF de texto a partir de líneas (fuente, tamaño, texto),
+    agregando páginas a medida que se llenan. Sólo usa las fuentes estándar
+    de PDF, por lo que no necesita bibliotecas externas.
+    """
+    pages, content, y = [], [], PAGE_HEIGHT - MARGIN
+    for font, size, text in lines:
+        leading = size * 1.5
+        if y - leading < MARGIN:
+            pages.append(content)
+            content, y = [], PAGE_HEIGHT - MARGIN
+        y -= leading
+        if text:
+            content.append(
+                b"BT /%s %d Tf %d %.2f Td %s Tj ET"
+                % (font.encode(), size, MARGIN, y, _pdf_string(text))
+            )
+    pages.append(content)
+
+    objects = []  # El objeto N ocupa la posición N - 1
+    font_refs = {}
+    for name, base_font in FONTS.items():
+        objects.append(
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /%s "
+            b"/Encoding /WinAnsiEncoding >>" % base_font.encode()
+        )
+        font_refs[name] = len(objects)
+    resources = b"<< /Font << %s >> >>" % b" ".join(
+        b"/%s %d 0 R" % (name.encode(), ref) for name, ref in font_refs.items()
+    )
+    pages_ref = len(objects) + 2 * len(pages) + 1
+    page_refs = []
+    for content in pages:
+        stream = b"\n".join(content)
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        objects.append(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources %s /Contents %d 0 R >>"
+            % (pages_ref, PAGE_WIDTH, PAGE_HEIGHT, resources, len(objects))
+        )
+        page_refs.append(len(objects))
+    objects.append(
+        b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (b" ".join(b"%d 0 R" % ref for ref in page_refs), len(page_refs))
+    )
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_ref)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        len(objects),
+        xref,
+    )
+    return bytes(output)
+
+
+def _money(amount: float) -> str:
+    return f"${amount:,.2f}"
+
+
+def statement_lines(statement: dict) -> List[Tuple[str, int, str]]:
+    """
+    Contenido del estado de cuenta de un comprador, con el mismo formato que
+    el informe que se generaba en la aplicación de escritorio.
+    """
+    buyer = statement["buyer"]
+    lines = [
+        ("F2", 16, f"Informe para {buyer['buyer_name'] or 'Nombre no disponible'}"),
+        ("F1", 12, f"Caballo: {statement['horse_name']}"),
+        ("F1", 12, f"Mes/Año: {statement['mes']:02d}/{statement['año']}"),
+        ("F1", 12, ""),
+    ]
+
+    if buyer["installments"]:
+        lines.append(("F2", 12, "Cuota:"))
+        lines.append(("F3", 10, f"{'Cuota':<8}{'Monto':>16}{'Pagado':>16}  Estado"))
+        for installment in buyer["installments"]:
+            lines.append(
+                (
+                    "F3",
+                    10,
+                    f"{installment['installment_number']:<8}"
+                    f"{_money(installment['amount']):>16}"
+                    f"{_money(installment['amount_paid']):>16}"
+                    f"  {installment['status'].value}",
+                )
+            )
+    else:
+        lines.append(("F1", 12, "No hay cuota para este mes."))
+    lines.append(("F1", 12, ""))
+
+    shares = {share["transaction_id"]: share["amount"] for share in buyer["shares"]}
+    if statement["transactions"]:
+        lines.append(("F2", 12, "Transacciones:"))
+        lines.append(
+            ("F3", 10, f"{'Tipo':<8}{'Concepto':<30}{'Monto':>16}{'Parte':>16}")
+        )
+        for transaction in statement["transactions"]:
+            share = shares.get(transaction["id"])
+            lines.append(
+                (
+                    "F3",
+                    10,
+                    f"{transaction['type'].value:<8}"
+                    f"{(transaction['concept'] or '-')[:28]:<30}"
+                    f"{_money(transaction['total_amount']):>16}"
+                    f"{_money(share) if share is not None else '-':>16}",
+                )
+            )
+    else:
+        lines.append(("F1", 12, "No hay transacciones para este mes."))
+    lines.append(("F1", 12, ""))
+
+    lines.append(("F1", 12, f"Balance del Comprador: {_money(buyer['balance'])}"))
+    lines.append(("F2", 12, f"Total: {_money(-buyer['total'])}"))
+    return lines
+
+
+def _write_statement(path: str, statement: dict) -> str:
+    """Renderiza un estado de cuenta y lo escribe en `path` (corre en un proceso hijo)."""
+    with open(path, "wb") as output:
+        output.write(render_pdf(statement_lines(statement)))
+    return os.path.basename(path)
+
+
+# ----------------------
+# Generación en segundo plano
+# ----------------------
+
+# Un solo hilo coordinador: los trabajos se ejecutan de a uno y cada uno
+# reparte el renderizado en su propio pool de procesos.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="statements")
+_jobs: Dict[str, dict] = {}
+_jobs_lock = threading.Lock()
+
+
+def job_dir(job: dict) -> str:
+    return os.path.join(STATEMENTS_DIR, job["id"])
+
+
+def cleanup_expired_jobs(now: Optional[datetime] = None) -> int:
+    """
+    Borra los directorios de los trabajos terminados hace más de
+    STATEMENTS_TTL, junto con su registro, y los directorios huérfanos (de
+    ejecuciones anteriores del servidor) igual de antiguos. Nunca toca los
+    trabajos en cola o en curso. Devuelve la cantidad de directorios borrados.
+    """
+    now = now or datetime.utcnow()
+    expired_before = now - STATEMENTS_TTL
+    with _jobs_lock:
+        active = {
+            job_id
+            for job_id, job in _jobs.items()
+            if job["status"] in ("queued", "running")
+        }
+        expired = [
+            job_id
+            for job_id, job in _jobs.items()
+            if job_id not in active and job["finished_at"] < expired_before
+        ]
+        for job_id in expired:
+            _jobs.pop(job_id)
+        tracked = set(_jobs)
+
+    if not os.path.isdir(STATEMENTS_DIR):
+        return 0
+    removed = 0
+    for name in os.listdir(STATEMENTS_DIR):
+        path = os.path.join(STATEMENTS_DIR, name)
+        if name in tracked or not os.path.isdir(path):
+            continue
+        modified = datetime.utcfromtimestamp(os.path.getmtime(path))
+        if name in expired or modified < expired_before:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    if removed:
+        logger.info(f"Se borraron {removed} directorios de estados de cuenta vencidos.")
+    return removed
+
+
+def _collect_statements(mes: int, año: int) -> List[dict]:
+    """
+    Arma, con los informes mensuales de cada caballo, los datos planos de los
+    estados de cuenta de todos sus compradores.
+    """
+    db_generator = get_db()
+    db = next(db_generator)
+    try:
+        horse_ids = db.scalars(
+            select(Horse.id)
+            .where(
+                select(HorseBuyer.id).where(HorseBuyer.horse_id == Horse.id).exists()
+            )
+            .order_by(Horse.id)
+        ).all()
+        statements = []
+        for horse_id in horse_ids:
+            report = schemas.HorseReportSchema.model_validate(
+                crud.get_horse_report(db, horse_id, mes, año)
+            ).model_dump()
+            # Las cuotas del informe no traen su número dentro del plan
+            installment_numbers = dict(
+                db.execute(
+                    select(Installment.id, Installment.installment_number).where(
+                        Installment.horse_id == horse_id,
+                        Installment.mes == mes,
+                        Installment.año == año,
+                    )
+                ).all()
+            )
+            for buyer in report["buyers"]:
+                for installment in buyer["installments"]:
+                    installment["installment_number"] = installment_numbers[
+                        installment["installment_id"]
+                    ]
+                statements.append(
+                    {
+                        "horse_id": horse_id,
+                        "horse_name": report["horse_name"],
+                        "mes": mes,
+                        "año": año,
+                        "buyer": buyer,
+                        "transactions": report["transactions"],
+                    }
+                )
+            db.expunge_all()
+        return statements
+    finally:
+        db.close()
+
+
+def _run_job(job: dict) -> None:
+    job["status"] = "running"
+    job["started_at"] = datetime.utcnow()
+    try:
+        cleanup_expired_jobs()
+        statements = _collect_statements(job["mes"], job["año"])
+        job["total"] = len(statements)
+        output_dir = job_dir(job)
+        os.makedirs(output_dir, exist_ok=True)
+        with ProcessPoolExecutor(max_workers=STATEMENT_WORKERS) as pool:
+            futures = [
+                pool.submit(
+                    _write_statement,
+                    os.path.join(
+                        output_dir,
+                        f"estado_{statement['horse_id']}_"
+                        f"{statement['buyer']['horse_buyer_id']}.pdf",
+                    ),
+                    statement,
+                )
+                for statement in statements
+            ]
+            for future in as_completed(futures):
+                try:
+                    job["files"].append(future.result())
+                    job["completed"] += 1
+                except Exception as e:
+                    job["failed"] += 1
+                    job["error"] = str(e)
+                    logger.error(f"Error al generar un estado de cuenta: {str(e)}")
+
+        job["files"].sort()
+        with zipfile.ZipFile(os.path.join(output_dir, ARCHIVE_NAME), "w") as archive:
+            for filename in job["files"]:
+                archive.write(os.path.join(output_dir, filename), filename)
+        job["status"] = "done"
+        logger.info(
+            f"Estados de cuenta {job['mes']:02d}/{job['año']}: "
+            f"{job['completed']} generados, {job['failed']} con error."
+        )
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
+        logger.error(f"Error al generar estados de cuenta: {str(e)}")
+    finally:
+        job["finished_at"] = datetime.utcnow()
+
+
+def submit_statements_job(mes: int, año: int) -> dict:
+    """
+    Encola la generación de los estados de cuenta en PDF de todos los
+    compradores de todos los caballos para el período, y devuelve el registro
+    del trabajo, que se actualiza a medida que avanza.
+    """
+    job = {
+        "id": uuid.uuid4().hex,
+        "mes": mes,
+        "año": año,
+        "status": "queued",
+        "queued_at": datetime.utcnow(),
+        "total": 0,
+        "completed": 0,
+        "failed": 0,
+        "files": [],
+    }
+    with _jobs_lock:
+        _jobs[job["id"]] = job
+        while len(_jobs) > MAX_TRACKED_JOBS:
+            _jobs.pop(next(iter(_jobs)))
+    _executor.submit(_run_job, job)
+    return dict(job, files=list(job["files"]))
+
+
+def get_statements_job(job_id: str) -> Optional[dict]:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    return dict(job, files=list(job["files"])) if job else None
@@ -0,0 +1,291 @@
+# backend/prod/bench/bench_balance_detail.py
+"""
+Detalle de saldo de un usuario (GET /users/{id}/balance) y total pagado con
+10k y 1M pagos de cuotas: la sentencia única actual frente a las cuatro
+consultas anteriores, que sumaban los pagos uniendo
+InstallmentPayment -> BuyerInstallment -> HorseBuyer.
+
+    python -m bench.bench_balance_detail [--sizes 10000 1000000] [--repeat N]
+"""
+
+from bench.common import median_ms, measure, print_table
+from datetime import datetime, timedelta
+from sqlalchemy import func, text
+from sqlalchemy.orm import sessionmaker
+import argparse
+
+from api import crud
+from api.cache import response_cache
+from api.models import (
+    engine,
+    metadata,
+    BuyerInstallment,
+    HorseBuyer,
+    InstallmentPayment,
+    PaymentStatus,
+    User,
+)
+
+USERS = 1000
+BUYERS_PER_HORSE = 10
+INSTALLMENTS_PER_HORSE = 60
+# Las primeras cuotas de cada caballo están pagadas en varios pagos parciales
+PAID_INSTALLMENTS = INSTALLMENTS_PER_HORSE // 2
+PAYMENTS_PER_INSTALLMENT = 4
+PAYMENTS_PER_HORSE = BUYERS_PER_HORSE * PAID_INSTALLMENTS * PAYMENTS_PER_INSTALLMENT
+BATCH_SIZE = 50_000
+
+
+def legacy_total_paid_amount(buyer_id: int, session) -> float:
+    return (
+        session.query(func.sum(InstallmentPayment.amount))
+        .join(BuyerInstallment)
+        .join(HorseBuyer)
+        .filter(HorseBuyer.buyer_id == buyer_id)
+        .scalar()
+        or 0.0
+    )
+
+
+def legacy_pending_installments_amount(buyer_id: int, session) -> float:
+    persisted = (
+        session.query(func.sum(BuyerInstallment.amount - BuyerInstallment.amount_paid))
+        .join(HorseBuyer)
+        .filter(
+            HorseBuyer.buyer_id == buyer_id,
+            BuyerInstallment.status
+            != BuyerInstallment.status_literal(PaymentStatus.PAID),
+            BuyerInstallment.status.in_([PaymentStatus.PENDING, PaymentStatus.PARTIAL]),
+        )
+        .scalar()
+        or 0.0
+    )
+    virtual = crud._virtual_installments_query(
+        HorseBuyer.buyer_id == buyer_id
+    ).subquery()
+    return persisted + (session.query(func.sum(virtual.c.amount)).scalar() or 0.0)
+
+
+def legacy_balance_detail(user_id: int, session) -> dict:
+    """Versión anterior: tenencias, saldo, pendiente y pagado por separado."""
+    horse_balances = [
+        {"horse_id": buyer.horse_id, "balance": buyer.balance}
+        for buyer in session.query(HorseBuyer).filter(HorseBuyer.buyer_id == user_id)
+    ]
+    return {
+        "current_balance": session.query(User.balance)
+        .filter(User.id == user_id)
+        .scalar()
+        or 0.0,
+        "pending_installments": legacy_pending_installments_amount(user_id, session),
+        "total_paid": legacy_total_paid_amount(user_id, session),
+        "horse_balances": horse_balances,
+    }
+
+
+def _insert(connection, table: str, columns: list, rows) -> None:
+    statement = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})"
+    )
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            connection.exec_driver_sql(statement, batch)
+            batch = []
+    if batch:
+        connection.exec_driver_sql(statement, batch)
+
+
+def seed(payments: int) -> None:
+    """
+    Vuelve a crear la base de la aplicación con `payments` pagos de cuotas
+    repartidos entre USERS usuarios.
+    """
+    horses = max(1, payments // PAYMENTS_PER_HORSE)
+    start = datetime(2024, 1, 1)
+    paid = PaymentStatus.PAID.name
+    pending = PaymentStatus.PENDING.name
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        _insert(
+            connection,
+            "users",
+            ["id", "name", "email", "balance", "is_admin", "is_deleted"],
+            (
+                (i, f"u{i}", f"u{i}@x.com", 0.0, False, False)
+                for i in range(1, USERS + 1)
+            ),
+        )
+        _insert(
+            connection,
+            "horses",
+            [
+                "id",
+                "name",
+                "total_value",
+                "number_of_installments",
+                "starting_billing_month",
+                "total_percentage",
+                "lazy_installments",
+            ],
+            (
+                (h, f"h{h}", 6000.0, INSTALLMENTS_PER_HORSE, 1, 100.0, False)
+                for h in range(1, horses + 1)
+            ),
+        )
+        _insert(
+            connection,
+            "horse_buyers",
+            ["id", "horse_id", "buyer_id", "percentage", "balance", "active"],
+            (
+                (
+                    (h - 1) * BUYERS_PER_HORSE + b + 1,
+                    h,
+                    ((h - 1) * BUYERS_PER_HORSE + b) % USERS + 1,
+                    100.0 / BUYERS_PER_HORSE,
+                    0.0,
+                    True,
+                )
+                for h in range(1, horses + 1)
+                for b in range(BUYERS_PER_HORSE)
+            ),
+        )
+        _insert(
+            connection,
+            "installments",
+            [
+                "id",
+                "horse_id",
+                "installment_number",
+                "amount",
+                "due_date",
+                "mes",
+                "año",
+            ],
+            (
+                (
+                    (h - 1) * INSTALLMENTS_PER_HORSE + n + 1,
+                    h,
+                    n + 1,
+                    100.0,
+                    start + timedelta(days=30 * n),
+                    (start + timedelta(days=30 * n)).month,
+                    (start + timedelta(days=30 * n)).year,
+                )
+                for h in range(1, horses + 1)
+                for n in range(INSTALLMENTS_PER_HORSE)
+            ),
+        )
+        share = 100.0 / BUYERS_PER_HORSE
+        _insert(
+            connection,
+            "buyer_installments",
+            [
+                "id",
+                "horse_buyer_id",
+                "installment_id",
+                "amount",
+                "amount_paid",
+                "status",
+            ],
+            (
+                (
+                    ((h - 1) * INSTALLMENTS_PER_HORSE + n) * BUYERS_PER_HORSE + b + 1,
+                    (h - 1) * BUYERS_PER_HORSE + b + 1,
+                    (h - 1) * INSTALLMENTS_PER_HORSE + n + 1,
+                    share,
+                    share if n < PAID_INSTALLMENTS else 0.0,
+                    paid if n < PAID_INSTALLMENTS else pending,
+                )
+                for h in range(1, horses + 1)
+                for n in range(INSTALLMENTS_PER_HORSE)
+                for b in range(BUYERS_PER_HORSE)
+            ),
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO transactions (id, type, concept, total_amount, mes, año) "
+            "VALUES (1, 'PAGO', 'Pagos de cuotas', 1, 1, 2024)"
+        )
+        _insert(
+            connection,
+            "installment_payments",
+            ["buyer_installment_id", "transaction_id", "buyer_id", "amount"],
+            (
+                (
+                    ((h - 1) * INSTALLMENTS_PER_HORSE + n) * BUYERS_PER_HORSE + b + 1,
+                    1,
+                    ((h - 1) * BUYERS_PER_HORSE + b) % USERS + 1,
+                    share / PAYMENTS_PER_INSTALLMENT,
+                )
+                for h in range(1, horses + 1)
+                for n in range(PAID_INSTALLMENTS)
+                for b in range(BUYERS_PER_HORSE)
+                for _ in range(PAYMENTS_PER_INSTALLMENT)
+            ),
+        )
+        connection.execute(text("ANALYZE"))
+    # Conexiones nuevas, con las estadísticas recién calculadas
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark del detalle de saldo")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    Session = sessionmaker(bind=engine)
+    user_id = 1
+    rows = []
+    for size in args.sizes:
+        seed(size)
+        with Session() as session:
+            payments = session.query(func.count(InstallmentPayment.id)).scalar()
+            mine = (
+                session.query(func.count(InstallmentPayment.id))
+                .filter(InstallmentPayment.buyer_id == user_id)
+                .scalar()
+            )
+            current = crud.get_user_balance_detail(user_id, session)
+            assert legacy_balance_detail(user_id, session) == current
+
+            def run(function):
+                return median_ms(
+                    measure(lambda: function(user_id, session), args.repeat)
+                )
+
+            detail = (run(crud.get_user_balance_detail), run(legacy_balance_detail))
+            total = (run(crud.get_total_paid_amount), run(legacy_total_paid_amount))
+
+        def request():
+            # Sin caché de respuestas: se mide la consulta, no la caché
+            response_cache.clear()
+            assert client.get(f"/users/{user_id}/balance").status_code == 200
+
+        route = median_ms(measure(request, args.repeat))
+        rows.append([payments, mine, *detail, *total, route])
+
+    print(f"Usuario {user_id}, mediana de {args.repeat} repeticiones")
+    print_table(
+        [
+            "pagos",
+            "del usuario",
+            "detalle",
+            "detalle ant.",
+            "total pagado",
+            "total ant.",
+            "GET balance",
+        ],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
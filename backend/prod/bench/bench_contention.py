@@ -0,0 +1,186 @@
+# backend/prod/bench/bench_contention.py
+"""
+Lecturas concurrentes contra un escritor en SQLite con distintos perfiles de
+PRAGMAs: lectores que piden el detalle de saldo y el listado de usuarios
+mientras un escritor reparte gastos entre los compradores de un caballo.
+Informa la latencia de las lecturas y de las escrituras confirmadas y los
+errores "database is locked" de cada perfil.
+
+    python -m bench.bench_contention [--readers 8] [--seconds 5] [--hold-ms 20]
+"""
+
+from bench.common import ms, percentile, print_table, temp_database_url
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+import argparse
+import random
+import threading
+import time
+
+from api import crud
+from api.models import create_db_engine, metadata, Horse, HorseBuyer, User
+from api.settings import settings
+
+USERS = 2000
+HORSES = 20
+BUYERS_PER_HORSE = 100
+
+# (nombre, journal_mode, busy_timeout en ms); el primero es el comportamiento
+# anterior a la configuración de SQLite, sin espera ante un bloqueo.
+PROFILES = [
+    ("DELETE, sin espera", "DELETE", 0),
+    ("DELETE, busy_timeout", "DELETE", 5000),
+    ("WAL, busy_timeout", "WAL", 5000),
+]
+
+
+def seed(engine) -> None:
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User),
+            [
+                dict(name=f"u{i}", email=f"u{i}@x.com", balance=0.0, is_admin=False)
+                for i in range(USERS)
+            ],
+        )
+        connection.execute(
+            insert(Horse),
+            [
+                dict(
+                    name=f"h{h}",
+                    total_value=1000.0,
+                    number_of_installments=12,
+                    starting_billing_month=1,
+                    total_percentage=100.0,
+                )
+                for h in range(HORSES)
+            ],
+        )
+        connection.execute(
+            insert(HorseBuyer),
+            [
+                dict(
+                    horse_id=h + 1,
+                    buyer_id=(h * BUYERS_PER_HORSE + b) % USERS + 1,
+                    percentage=100.0 / BUYERS_PER_HORSE,
+                    balance=0.0,
+                )
+                for h in range(HORSES)
+                for b in range(BUYERS_PER_HORSE)
+            ],
+        )
+
+
+def run_profile(journal_mode: str, busy_timeout_ms: int, args) -> dict:
+    settings.sqlite_journal_mode = journal_mode
+    settings.sqlite_busy_timeout_ms = busy_timeout_ms
+    engine = create_db_engine(temp_database_url(f"contention_{journal_mode}"))
+    seed(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {"latencies": [], "writes": [], "locked": 0, "errors": 0}
+
+    def count_error(error: Exception) -> None:
+        with lock:
+            if "database is locked" in str(error):
+                stats["locked"] += 1
+            else:
+                stats["errors"] += 1
+
+    def writer() -> None:
+        while not stop.is_set():
+            with Session() as session:
+                start = time.perf_counter()
+                try:
+                    crud.distribute_among_buyers(
+                        session,
+                        horse_id=random.randint(1, HORSES),
+                        amount=-10.0,
+                        concept="Gasto",
+                    )
+                    # Trabajo de la solicitud antes de confirmar
+                    time.sleep(args.hold_ms / 1000)
+                    session.commit()
+                    with lock:
+                        stats["writes"].append(time.perf_counter() - start)
+                except OperationalError as e:
+                    session.rollback()
+                    count_error(e)
+
+    def reader() -> None:
+        while not stop.is_set():
+            with Session() as session:
+                start = time.perf_counter()
+                try:
+                    crud.get_user_balance_detail(random.randint(1, USERS), session)
+                    crud.get_users(session, limit=100)
+                except OperationalError as e:
+                    count_error(e)
+                    continue
+                elapsed = time.perf_counter() - start
+            with lock:
+                stats["latencies"].append(elapsed)
+
+    threads = [threading.Thread(target=writer)] + [
+        threading.Thread(target=reader) for _ in range(args.readers)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de contención")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--hold-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    rows = []
+    for name, journal_mode, busy_timeout_ms in PROFILES:
+        stats = run_profile(journal_mode, busy_timeout_ms, args)
+        latencies = stats["latencies"] or [0.0]
+        writes = stats["writes"] or [0.0]
+        rows.append(
+            [
+                name,
+                len(stats["latencies"]),
+                ms(percentile(latencies, 0.5)),
+                ms(percentile(latencies, 0.99)),
+                ms(max(latencies)),
+                len(stats["writes"]),
+                ms(percentile(writes, 0.99)),
+                stats["locked"],
+                stats["errors"],
+            ]
+        )
+    print(
+        f"{args.readers} lectores y 1 escritor durante {args.seconds:g} s "
+        f"({args.hold_ms:g} ms por transacción de escritura)"
+    )
+    print_table(
+        [
+            "perfil",
+            "lecturas",
+            "p50",
+            "p99",
+            "máx",
+            "escrituras",
+            "escr. p99",
+            "locked",
+            "otros errores",
+        ],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# backend/prod/bench/bench_create_horse.py
+"""
+Alta de un caballo (caballo, compradores y calendario de cuotas en una
+transacción) con la generación masiva de cuotas actual frente a la anterior,
+que creaba una fila ORM por cuota y comprador con un flush por cuota.
+
+    python -m bench.bench_create_horse [--repeat N]
+"""
+
+from bench.common import fresh_engine, median_ms, measure, print_table
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+import argparse
+import statistics
+
+from api import crud
+from api.models import BuyerInstallment, Installment, PaymentStatus, User
+
+INSTALLMENTS = (12, 60, 120)
+BUYERS = (1, 10, 50)
+
+
+def legacy_create_installments_for_horse(horse, db) -> None:
+    """Generación anterior: un flush por cuota y un objeto ORM por comprador."""
+    for i in range(1, horse.number_of_installments + 1):
+        due_date = crud.calculate_due_date(
+            horse.creation_date, i, horse.starting_billing_month
+        )
+        installment = Installment(
+            horse_id=horse.id,
+            due_date=due_date,
+            amount=horse.total_value / horse.number_of_installments,
+            installment_number=i,
+            mes=due_date.month,
+            año=due_date.year,
+        )
+        db.add(installment)
+        db.flush()
+        for horse_buyer in horse.buyers:
+            db.add(
+                BuyerInstallment(
+                    horse_buyer_id=horse_buyer.id,
+                    installment_id=installment.id,
+                    amount=installment.amount * (horse_buyer.percentage / 100),
+                    amount_paid=0.0,
+                    status=PaymentStatus.PENDING,
+                )
+            )
+
+
+PATHS = {
+    "masivo": crud._create_installments_for_horse,
+    "por fila": legacy_create_installments_for_horse,
+}
+
+
+def bench_case(installments: int, buyers: int, repeat: int) -> dict:
+    engine = fresh_engine(f"create_horse_{installments}_{buyers}")
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User),
+            [
+                dict(name=f"u{i}", email=f"u{i}@x.com", balance=0.0, is_admin=False)
+                for i in range(buyers)
+            ],
+        )
+    Session = sessionmaker(bind=engine, autoflush=False)
+    buyers_data = [
+        {"buyer_id": i + 1, "percentage": 100 / buyers} for i in range(buyers)
+    ]
+    current = crud._create_installments_for_horse
+    timings = {}
+    try:
+        for label, create_installments in PATHS.items():
+            crud._create_installments_for_horse = create_installments
+
+            def create_horse():
+                with Session() as session:
+                    crud._create_horse_with_buyers(
+                        starting_billing_month=1,
+                        session=session,
+                        name="bench",
+                        total_value=120_000.0,
+                        number_of_installments=installments,
+                        buyers_data=buyers_data,
+                    )
+
+            create_horse()  # calentamiento
+            timings[label] = measure(create_horse, repeat)
+    finally:
+        crud._create_installments_for_horse = current
+        engine.dispose()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark del alta de caballos")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = []
+    for installments in INSTALLMENTS:
+        for buyers in BUYERS:
+            timings = bench_case(installments, buyers, args.repeat)
+            bulk, legacy = timings["masivo"], timings["por fila"]
+            rows.append(
+                [
+                    installments,
+                    buyers,
+                    installments * buyers,
+                    median_ms(bulk),
+                    median_ms(legacy),
+                    f"{statistics.median(legacy) / statistics.median(bulk):.1f}x",
+                ]
+            )
+    print(f"Alta de caballo, mediana de {args.repeat} repeticiones")
+    print_table(
+        ["cuotas", "compradores", "filas", "masivo", "por fila", "mejora"], rows
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# backend/prod/bench/bench_serialization.py
+"""
+Serialización de los listados grandes: filas de columnas convertidas con
+`schema_rows` y codificadas con `dumps` (orjson si está instalado) frente a
+objetos ORM validados con Pydantic (`model_validate` + `model_dump`) y
+codificados como lo hace JSONResponse. Verifica que ambos caminos produzcan
+exactamente los mismos bytes para las mismas filas.
+
+    python -m bench.bench_serialization [--sizes 100 1000 10000] [--repeat N]
+"""
+
+from bench.common import fresh_engine, median_ms, measure, print_table
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from sqlalchemy.orm import selectinload, sessionmaker
+import argparse
+import json
+import statistics
+
+from api import schemas
+from api.models import Horse, Transaction, TransactionType, User
+from api.serialization import dumps, orjson, schema_columns, schema_rows
+
+ENTITIES = {
+    "users": (User, schemas.UserSchema),
+    "horses": (Horse, schemas.HorseSchema),
+    "transactions": (Transaction, schemas.TransactionSchema),
+}
+
+# Las transacciones sembradas no tienen pagos de cuotas (el período de un pago
+# sale de su cuota, no del objeto ORM); se precargan para no medir N+1.
+EAGER = {Transaction: [selectinload(Transaction.installment_payments)]}
+
+
+def seed(engine, rows: int) -> None:
+    start = datetime(2025, 1, 1, 12, 30, 15, 250000)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User),
+            [
+                dict(
+                    name=f"Muñoz {i}",
+                    email=f"u{i}@x.com",
+                    balance=i * 10.25,
+                    is_admin=False,
+                    created_at=start + timedelta(minutes=i),
+                    updated_at=start + timedelta(minutes=i),
+                )
+                for i in range(rows)
+            ],
+        )
+        connection.execute(
+            insert(Horse),
+            [
+                dict(
+                    name=f"Caballo {i}",
+                    information="Pura sangre de carrera" if i % 2 else None,
+                    total_value=10000.0 + i,
+                    number_of_installments=12,
+                    starting_billing_month=i % 12 + 1,
+                    total_percentage=100.0,
+                    creation_date=start + timedelta(hours=i),
+                )
+                for i in range(rows)
+            ],
+        )
+        connection.execute(
+            insert(Transaction),
+            [
+                dict(
+                    type=TransactionType.EGRESO,
+                    date=start + timedelta(days=i % 365),
+                    concept=f"Veterinaria {i}",
+                    total_amount=150.5 + i,
+                    notes="Revisión anual" if i % 3 else None,
+                    horse_id=i % rows + 1,
+                    user_id=None,
+                    mes=(start + timedelta(days=i % 365)).month,
+                    año=(start + timedelta(days=i % 365)).year,
+                    created_at=start,
+                    updated_at=start,
+                )
+                for i in range(rows)
+            ],
+        )
+
+
+def column_rows_json(session, model, schema, rows: int) -> bytes:
+    """Camino actual de los listados: columnas, dicts y `dumps`."""
+    query = session.query(*schema_columns(schema, model)).order_by(model.id)
+    return dumps(schema_rows(query.limit(rows).all(), schema))
+
+
+def pydantic_json(session, model, schema, rows: int) -> bytes:
+    """Camino anterior: objetos ORM validados y volcados con Pydantic."""
+    objects = (
+        session.query(model)
+        .options(*EAGER.get(model, []))
+        .order_by(model.id)
+        .limit(rows)
+        .all()
+    )
+    content = [schema.model_validate(obj).model_dump(mode="json") for obj in objects]
+    # Misma codificación que fastapi.responses.JSONResponse
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de serialización")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = fresh_engine("serialization")
+    seed(engine, max(args.sizes))
+    Session = sessionmaker(bind=engine)
+    table = []
+    for entity, (model, schema) in ENTITIES.items():
+        for size in args.sizes:
+            with Session() as session:
+                fast = column_rows_json(session, model, schema, size)
+                slow = pydantic_json(session, model, schema, size)
+                assert fast == slow, f"{entity}: el JSON difiere con {size} filas"
+                session.expunge_all()
+
+                def run(function):
+                    def call():
+                        function(session, model, schema, size)
+                        # Sin objetos en el mapa de identidad entre repeticiones
+                        session.expunge_all()
+
+                    return measure(call, args.repeat)
+
+                rows_samples = run(column_rows_json)
+                pydantic_samples = run(pydantic_json)
+            table.append(
+                [
+                    entity,
+                    size,
+                    len(fast),
+                    median_ms(rows_samples),
+                    median_ms(pydantic_samples),
+                    f"{statistics.median(pydantic_samples) / statistics.median(rows_samples):.1f}x",
+                ]
+            )
+    encoder = "orjson" if orjson is not None else "json"
+    print(f"Mediana de {args.repeat} repeticiones ({encoder}); JSON idéntico")
+    print_table(
+        ["entidad", "filas", "bytes", "filas+dumps", "Pydantic", "mejora"], table
+    )
+
+
+if __name__ == "__main__":
+    main()
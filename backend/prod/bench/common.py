@@ -0,0 +1,76 @@
+# backend/prod/bench/common.py
+"""
+Utilidades compartidas por los benchmarks. Se ejecutan desde backend/prod
+como módulos, p. ej.:
+
+    python -m bench.bench_create_horse
+
+Cada benchmark trabaja sobre bases SQLite temporales que se borran al salir;
+nunca toca horses.db.
+"""
+
+import atexit
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+# Los módulos de la API crean el engine al importarse: apuntarlo a una base
+# temporal antes de que el benchmark los importe.
+TEMP_DIR = tempfile.mkdtemp(prefix="horses-bench-")
+atexit.register(shutil.rmtree, TEMP_DIR, ignore_errors=True)
+os.environ.setdefault(
+    "HORSES_DATABASE_URL", "sqlite:///" + os.path.join(TEMP_DIR, "app.db")
+)
+
+
+def temp_database_url(name: str) -> str:
+    """URL de una base SQLite `name` dentro del directorio temporal."""
+    path = os.path.join(TEMP_DIR, f"{name}.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return "sqlite:///" + path
+
+
+def fresh_engine(name: str):
+    """Engine sobre una base temporal nueva con el esquema de la aplicación."""
+    from api.models import create_db_engine, metadata
+
+    engine = create_db_engine(temp_database_url(name))
+    metadata.create_all(engine)
+    return engine
+
+
+def measure(function, repeat: int = 5) -> list:
+    """Ejecuta `function` `repeat` veces y devuelve la duración de cada una."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f} ms"
+
+
+def median_ms(samples: list) -> str:
+    return ms(statistics.median(samples))
+
+
+def print_table(headers: list, rows: list) -> None:
+    """Imprime `rows` como una tabla de texto alineada."""
+    cells = [[str(value) for value in row] for row in [headers, *rows]]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for index, row in enumerate(cells):
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+        if index == 0:
+            print("  ".join("-" * width for width in widths))
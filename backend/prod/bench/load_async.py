@@ -0,0 +1,256 @@
+# backend/prod/bench/load_async.py
+"""
+Prueba de carga del modo sync frente al modo async (settings.db_async) con
+50 a 500 clientes concurrentes. Levanta la aplicación con uvicorn una vez por
+modo, ambas sobre la misma base sembrada y con la caché de respuestas
+desactivada, y reparte las solicitudes entre las rutas de lectura
+frecuentes. Requiere uvicorn, httpx y, para el modo async, aiosqlite.
+
+    python -m bench.load_async [--clients 50 100 200 500] [--seconds 10]
+"""
+
+from bench.common import ms, percentile, print_table, temp_database_url
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from api.models import (
+    create_db_engine,
+    metadata,
+    BuyerInstallment,
+    Horse,
+    HorseBuyer,
+    Installment,
+    PaymentStatus,
+    Transaction,
+    TransactionType,
+    User,
+)
+from api.settings import BASE_DIR
+
+USERS = 500
+HORSES = 100
+BUYERS_PER_HORSE = 5
+INSTALLMENTS_PER_HORSE = 24
+TRANSACTIONS = 5000
+
+
+def routes(rng: random.Random) -> str:
+    """Ruta de lectura al azar, con la mezcla de un cliente típico."""
+    user_id = rng.randint(1, USERS)
+    return rng.choice(
+        [
+            f"/users/{user_id}",
+            f"/users/{user_id}/balance",
+            f"/users/{user_id}/summary",
+            f"/horses/{rng.randint(1, HORSES)}",
+            f"/horse-buyers/?limit=50",
+            f"/transactions/?limit=50&horse_id={rng.randint(1, HORSES)}",
+        ]
+    )
+
+
+def seed(url: str) -> None:
+    engine = create_db_engine(url)
+    metadata.create_all(engine)
+    start = datetime.utcnow() - timedelta(days=365)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User),
+            [
+                dict(name=f"u{i}", email=f"u{i}@x.com", balance=0.0, is_admin=False)
+                for i in range(USERS)
+            ],
+        )
+        connection.execute(
+            insert(Horse),
+            [
+                dict(
+                    name=f"h{h}",
+                    total_value=24000.0,
+                    number_of_installments=INSTALLMENTS_PER_HORSE,
+                    starting_billing_month=1,
+                    total_percentage=100.0,
+                )
+                for h in range(HORSES)
+            ],
+        )
+        connection.execute(
+            insert(HorseBuyer),
+            [
+                dict(
+                    horse_id=h + 1,
+                    buyer_id=(h * BUYERS_PER_HORSE + b) % USERS + 1,
+                    percentage=100.0 / BUYERS_PER_HORSE,
+                    balance=0.0,
+                )
+                for h in range(HORSES)
+                for b in range(BUYERS_PER_HORSE)
+            ],
+        )
+        due_dates = [
+            start + timedelta(days=30 * n) for n in range(INSTALLMENTS_PER_HORSE)
+        ]
+        connection.execute(
+            insert(Installment),
+            [
+                dict(
+                    horse_id=h + 1,
+                    installment_number=n + 1,
+                    amount=1000.0,
+                    due_date=due_date,
+                    mes=due_date.month,
+                    año=due_date.year,
+                )
+                for h in range(HORSES)
+                for n, due_date in enumerate(due_dates)
+            ],
+        )
+        connection.execute(
+            insert(BuyerInstallment),
+            [
+                dict(
+                    horse_buyer_id=h * BUYERS_PER_HORSE + b + 1,
+                    installment_id=h * INSTALLMENTS_PER_HORSE + n + 1,
+                    amount=1000.0 / BUYERS_PER_HORSE,
+                    amount_paid=0.0,
+                    status=PaymentStatus.PENDING,
+                )
+                for h in range(HORSES)
+                for n in range(INSTALLMENTS_PER_HORSE)
+                for b in range(BUYERS_PER_HORSE)
+            ],
+        )
+        connection.execute(
+            insert(Transaction),
+            [
+                dict(
+                    type=TransactionType.EGRESO,
+                    date=start + timedelta(hours=i),
+                    concept=f"Gasto {i}",
+                    total_amount=100.0,
+                    horse_id=i % HORSES + 1,
+                    mes=(start + timedelta(hours=i)).month,
+                    año=(start + timedelta(hours=i)).year,
+                )
+                for i in range(TRANSACTIONS)
+            ],
+        )
+        connection.exec_driver_sql("ANALYZE")
+    engine.dispose()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url: str, async_mode: bool, port: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        HORSES_DATABASE_URL=database_url,
+        HORSES_DB_ASYNC=str(async_mode).lower(),
+        HORSES_RESPONSE_CACHE_SIZE="0",
+    )
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        cwd=BASE_DIR,
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("uvicorn no pudo iniciar la aplicación")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("La aplicación no respondió a tiempo")
+
+
+async def run_load(base_url: str, clients: int, seconds: float) -> dict:
+    stats = {"latencies": [], "errors": 0}
+    deadline = time.monotonic() + seconds
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+
+        async def worker(seed: int) -> None:
+            rng = random.Random(seed)
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(routes(rng))
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    stats["latencies"].append(time.perf_counter() - start)
+                else:
+                    stats["errors"] += 1
+
+        await asyncio.gather(*(worker(seed) for seed in range(clients)))
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prueba de carga sync/async")
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 100, 200, 500])
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    database_url = temp_database_url("load")
+    seed(database_url)
+    rows = []
+    for mode, async_mode in (("sync", False), ("async", True)):
+        port = free_port()
+        server = start_server(database_url, async_mode, port)
+        try:
+            for clients in args.clients:
+                stats = asyncio.run(
+                    run_load(f"http://127.0.0.1:{port}", clients, args.seconds)
+                )
+                latencies = stats["latencies"] or [0.0]
+                rows.append(
+                    [
+                        mode,
+                        clients,
+                        f"{len(stats['latencies']) / args.seconds:.0f}",
+                        ms(percentile(latencies, 0.5)),
+                        ms(percentile(latencies, 0.99)),
+                        stats["errors"],
+                    ]
+                )
+        finally:
+            server.terminate()
+            server.wait()
+    print(f"{args.seconds:g} s por nivel de concurrencia, misma base sembrada")
+    print_table(["modo", "clientes", "req/s", "p50", "p99", "errores"], rows)
+
+
+if __name__ == "__main__":
+    main()
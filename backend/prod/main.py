@@ -5,8 +5,9 @@ from api import routes  # Importing routes module
 from fastapi.middleware.cors import CORSMiddleware
 from api.models import create_tables
 from api.overdue_checker import (
-    check_overdue_installments,
-)  # Importa la función de verificación
+    start_overdue_scheduler,
+    stop_overdue_scheduler,
+)  # Verificación periódica de cuotas vencidas
 
 app = FastAPI()
 
@@ -25,6 +26,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all HTTP methods
     allow_headers=["*"],  # Allows all headers
+    # Cursor de paginación y validadores para GET condicionales
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
 
 
@@ -36,9 +39,13 @@ def read_root():
 
 @app.on_event("startup")
 def on_startup():
-    # Verificar cuotas vencidas al iniciar la aplicación
-    check_overdue_installments()
-    # Crear tablas si no existen
+    # Verificar cuotas vencidas al iniciar y luego periódicamente, sin bloquear
+    start_overdue_scheduler()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    stop_overdue_scheduler()
 
 
 create_tables()
@@ -0,0 +1,147 @@
+# backend/prod/tests/conftest.py
+
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Los módulos de la API crean el engine al importarse: apuntarlo a una base
+# temporal antes de que cualquier prueba los importe. Siempre se reemplaza,
+# porque `app_engine` borra las tablas de esa base, y se ignora el
+# settings.json local.
+TEST_DIR = tempfile.mkdtemp(prefix="horses-tests-")
+os.environ["HORSES_DATABASE_URL"] = "sqlite:///" + os.path.join(TEST_DIR, "app.db")
+os.environ["HORSES_SETTINGS_FILE"] = os.path.join(TEST_DIR, "settings.json")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.models import (  # noqa: E402
+    create_db_engine,
+    metadata,
+    BuyerInstallment,
+    Horse,
+    HorseBuyer,
+    Installment,
+    PaymentStatus,
+    User,
+)
+
+# Fecha de referencia de los datos sembrados
+NOW = datetime(2026, 1, 1)
+
+
+def seed_schedules(engine, horses: int, installments: int, buyers: int) -> None:
+    """
+    Siembra `horses` caballos con `installments` cuotas mensuales y `buyers`
+    compradores cada uno. Las cuotas vencidas hace más de dos meses quedan
+    pagadas y el resto pendientes.
+    """
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User),
+            [
+                dict(name=f"u{i}", email=f"u{i}@x.com", balance=0.0, is_admin=False)
+                for i in range(buyers)
+            ],
+        )
+        connection.execute(
+            insert(Horse),
+            [
+                dict(
+                    name=f"h{h}",
+                    total_value=1000.0,
+                    number_of_installments=installments,
+                    starting_billing_month=1,
+                    total_percentage=100.0,
+                )
+                for h in range(horses)
+            ],
+        )
+        connection.execute(
+            insert(HorseBuyer),
+            [
+                dict(
+                    horse_id=h + 1,
+                    buyer_id=b + 1,
+                    percentage=100.0 / buyers,
+                    balance=0.0,
+                    active=True,
+                )
+                for h in range(horses)
+                for b in range(buyers)
+            ],
+        )
+        due_dates = [
+            NOW + timedelta(days=30 * (n - installments // 2))
+            for n in range(installments)
+        ]
+        connection.execute(
+            insert(Installment),
+            [
+                dict(
+                    horse_id=h + 1,
+                    installment_number=n + 1,
+                    amount=10.0,
+                    due_date=due_date,
+                    mes=due_date.month,
+                    año=due_date.year,
+                )
+                for h in range(horses)
+                for n, due_date in enumerate(due_dates)
+            ],
+        )
+        rows = []
+        for h in range(horses):
+            for n, due_date in enumerate(due_dates):
+                paid = due_date < NOW - timedelta(days=60)
+                for b in range(buyers):
+                    rows.append(
+                        dict(
+                            horse_buyer_id=h * buyers + b + 1,
+                            installment_id=h * installments + n + 1,
+                            amount=10.0 / buyers,
+                            amount_paid=10.0 / buyers if paid else 0.0,
+                            status=(
+                                PaymentStatus.PAID if paid else PaymentStatus.PENDING
+                            ),
+                            created_at=NOW - timedelta(days=900),
+                            updated_at=NOW - timedelta(days=900),
+                        )
+                    )
+        connection.execute(insert(BuyerInstallment), rows)
+        connection.exec_driver_sql("ANALYZE")
+
+
+@pytest.fixture(scope="session")
+def seeded_engine(tmp_path_factory):
+    """Base SQLite con varios miles de cuotas y estadísticas de ANALYZE."""
+    path = tmp_path_factory.mktemp("plans") / "plans.db"
+    engine = create_db_engine(f"sqlite:///{path}")
+    metadata.create_all(engine)
+    seed_schedules(engine, horses=40, installments=60, buyers=5)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def app_engine():
+    """Base de la aplicación (la de HORSES_DATABASE_URL), vacía en cada prueba."""
+    from api.cache import response_cache
+    from api.models import engine
+
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    response_cache.clear()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def client(app_engine):
+    """Cliente HTTP de la aplicación sobre la base vacía de `app_engine`."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    return TestClient(app)
@@ -0,0 +1,62 @@
+# backend/prod/tests/test_create_tables.py
+
+from sqlalchemy import func, insert, select
+from api import models
+from api.models import BalanceEntry, HorseBuyer, User
+from conftest import seed_schedules
+
+
+def ledger_sums(connection, column):
+    return dict(
+        connection.execute(
+            select(column, func.sum(BalanceEntry.amount))
+            .where(column.is_not(None))
+            .group_by(column)
+        ).all()
+    )
+
+
+def test_new_ledger_is_backfilled_with_opening_balances(app_engine):
+    seed_schedules(app_engine, horses=2, installments=1, buyers=2)
+    with app_engine.begin() as connection:
+        BalanceEntry.__table__.drop(connection)
+        connection.execute(
+            HorseBuyer.__table__.update().values(
+                balance=HorseBuyer.id * 10.0 - 25.0  # -15, -5, 5, 15
+            )
+        )
+        # Usuario 1: HorseBuyers 1 y 3 (-10) más 7.5 ajenos a ellos
+        connection.execute(
+            User.__table__.update().where(User.id == 1).values(balance=-10.0 + 7.5)
+        )
+        connection.execute(
+            User.__table__.update().where(User.id == 2).values(balance=10.0)
+        )
+        connection.execute(insert(User).values(name="s", email="s@x.com", balance=0.0))
+
+    models.create_tables()
+    models.create_tables()  # idempotente
+
+    with app_engine.connect() as connection:
+        entries = connection.execute(
+            select(
+                BalanceEntry.user_id, BalanceEntry.horse_buyer_id, BalanceEntry.amount
+            ).order_by(BalanceEntry.id)
+        ).all()
+        assert sorted(entries, key=lambda entry: (entry[1] is None, entry[1])) == [
+            (1, 1, -15.0),
+            (2, 2, -5.0),
+            (1, 3, 5.0),
+            (2, 4, 15.0),
+            (1, None, 7.5),
+        ]
+        assert ledger_sums(connection, BalanceEntry.user_id) == dict(
+            connection.execute(
+                select(User.id, User.balance).where(User.balance != 0)
+            ).all()
+        )
+        assert ledger_sums(connection, BalanceEntry.horse_buyer_id) == dict(
+            connection.execute(select(HorseBuyer.id, HorseBuyer.balance)).all()
+        )
+        concepts = connection.scalars(select(BalanceEntry.concept).distinct()).all()
+    assert concepts == [models.OPENING_BALANCE_CONCEPT]
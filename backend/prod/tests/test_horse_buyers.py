@@ -0,0 +1,174 @@
+# backend/prod/tests/test_horse_buyers.py
+
+from sqlalchemy import select
+from sqlalchemy.exc import SAWarning
+from api import crud
+from api.models import BalanceEntry, BuyerInstallment, HorseBuyer, PaymentStatus, User
+import warnings
+
+
+def create_horse(client, buyers, total_value=1200.0, installments=12):
+    users = [
+        client.post("/users/", json={"name": f"u{i}", "email": f"u{i}@x.com"}).json()
+        for i in range(3)
+    ]
+    response = client.post(
+        "/horses/",
+        json={
+            "name": "h",
+            "total_value": total_value,
+            "number_of_installments": installments,
+            "starting_billing_month": 1,
+            "buyers_data": [
+                {"buyer_id": users[index]["id"], "percentage": percentage}
+                for index, percentage in buyers
+            ],
+        },
+    )
+    assert response.status_code in (200, 201), response.text
+    return response.json()["id"], [user["id"] for user in users]
+
+
+def horse_buyers(connection, horse_id):
+    return connection.execute(
+        select(HorseBuyer.buyer_id, HorseBuyer.percentage)
+        .where(HorseBuyer.horse_id == horse_id)
+        .order_by(HorseBuyer.buyer_id)
+    ).all()
+
+
+def test_duplicate_buyers_are_rejected_before_any_change(client, app_engine):
+    horse_id, users = create_horse(client, [(0, 50), (1, 50)])
+
+    response = client.put(
+        f"/horses/{horse_id}",
+        json={
+            "name": "otro",
+            "buyers_data": [
+                {"buyer_id": users[0], "percentage": 50},
+                {"buyer_id": users[0], "percentage": 50},
+            ],
+        },
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Hay compradores repetidos"
+    assert client.get(f"/horses/{horse_id}").json()["name"] == "h"
+    with app_engine.connect() as connection:
+        assert horse_buyers(connection, horse_id) == [(users[0], 50), (users[1], 50)]
+
+
+def test_unknown_buyer_is_a_bad_request(client, app_engine):
+    horse_id, users = create_horse(client, [(0, 100)])
+
+    response = client.put(
+        f"/horses/{horse_id}",
+        json={"buyers_data": [{"buyer_id": 999, "percentage": 100}]},
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Datos inválidos")
+    with app_engine.connect() as connection:
+        assert horse_buyers(connection, horse_id) == [(users[0], 100)]
+
+
+def test_removed_buyer_installments_are_deleted_once(client, app_engine):
+    horse_id, users = create_horse(client, [(0, 50), (1, 50)])
+    # Cargar las cuotas en la sesión, como lo hace el detalle del caballo
+    client.get(f"/horses/{horse_id}")
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", SAWarning)
+        response = client.put(
+            f"/horses/{horse_id}",
+            json={"buyers_data": [{"buyer_id": users[0], "percentage": 100}]},
+        )
+
+    assert response.status_code == 200, response.text
+    with app_engine.connect() as connection:
+        assert horse_buyers(connection, horse_id) == [(users[0], 100)]
+        amounts = connection.scalars(select(BuyerInstallment.amount)).all()
+    assert amounts == [100.0] * 12
+
+
+def test_repricing_reconciles_paid_installments(client, app_engine):
+    horse_id, users = create_horse(client, [(0, 50), (1, 50)])
+    with app_engine.connect() as connection:
+        first, second = connection.scalars(
+            select(BuyerInstallment.id)
+            .join(HorseBuyer)
+            .where(HorseBuyer.buyer_id == users[0])
+            .order_by(BuyerInstallment.id)
+            .limit(2)
+        ).all()
+    assert client.post(f"/installments/pay/{first}").status_code == 200
+
+    # 50 -> 40: la cuota pagada (50) queda con 10 de excedente
+    response = client.put(
+        f"/horses/{horse_id}",
+        json={
+            "buyers_data": [
+                {"buyer_id": users[0], "percentage": 40},
+                {"buyer_id": users[1], "percentage": 60},
+            ]
+        },
+    )
+    assert response.status_code == 200, response.text
+    with app_engine.connect() as connection:
+        paid = connection.execute(
+            select(
+                BuyerInstallment.amount,
+                BuyerInstallment.amount_paid,
+                BuyerInstallment.status,
+            ).where(BuyerInstallment.id == first)
+        ).one()
+        assert paid == (40.0, 40.0, PaymentStatus.PAID)
+        refund = connection.execute(
+            select(BalanceEntry.amount, BalanceEntry.concept).where(
+                BalanceEntry.buyer_installment_id == first, BalanceEntry.amount > 0
+            )
+        ).one()
+        assert refund == (10.0, "Reajuste de cuota")
+        assert connection.scalar(select(User.balance).where(User.id == users[0])) == (
+            -40.0
+        )
+        assert connection.scalar(
+            select(BuyerInstallment.status).where(BuyerInstallment.id == second)
+        ) == (PaymentStatus.PENDING)
+
+    # 40 -> 60: la cuota pagada pasa a parcial
+    response = client.put(
+        f"/horses/{horse_id}",
+        json={
+            "buyers_data": [
+                {"buyer_id": users[0], "percentage": 60},
+                {"buyer_id": users[1], "percentage": 40},
+            ]
+        },
+    )
+    assert response.status_code == 200, response.text
+    with app_engine.connect() as connection:
+        paid = connection.execute(
+            select(
+                BuyerInstallment.amount,
+                BuyerInstallment.amount_paid,
+                BuyerInstallment.status,
+            ).where(BuyerInstallment.id == first)
+        ).one()
+        assert paid == (60.0, 40.0, PaymentStatus.PARTIAL)
+
+
+def test_only_virtual_installments_have_a_null_id(client, monkeypatch):
+    schema = client.get("/openapi.json").json()["components"]["schemas"]
+    assert "id" in schema["BuyerInstallmentSchema"]["required"]
+    assert schema["BuyerInstallmentSchema"]["properties"]["id"] == {
+        "type": "integer",
+        "title": "Id",
+    }
+
+    monkeypatch.setattr(crud, "LAZY_INSTALLMENTS", True)
+    create_horse(client, [(0, 50), (1, 50)])
+    assert client.post("/horse-buyers/1/installments/1/pay").status_code == 200
+
+    installments = client.get("/horse-buyers/1").json()["installments"]
+    assert [installment["id"] for installment in installments[:2]] == [1, None]
@@ -0,0 +1,157 @@
+# backend/prod/tests/test_overdue_checker.py
+
+from datetime import datetime
+from sqlalchemy import func, insert, literal, select, update
+from api import overdue_checker
+from api.models import (
+    BalanceEntry,
+    BuyerInstallment,
+    Installment,
+    JobCheckpoint,
+    PaymentStatus,
+    User,
+)
+from conftest import seed_schedules
+
+import pytest
+
+
+def count_overdue_candidates(connection, current_time: datetime) -> int:
+    return connection.scalar(
+        select(func.count())
+        .select_from(BuyerInstallment)
+        .join(Installment)
+        .where(
+            Installment.due_date < current_time,
+            BuyerInstallment.status == PaymentStatus.PENDING,
+        )
+    )
+
+
+def test_full_sweep_marks_every_due_installment_in_chunks(app_engine, monkeypatch):
+    seed_schedules(app_engine, horses=3, installments=24, buyers=4)
+    monkeypatch.setattr(overdue_checker, "OVERDUE_CHUNK_SIZE", 7)
+    with app_engine.connect() as connection:
+        expected = count_overdue_candidates(connection, datetime.utcnow())
+    assert expected > 7
+
+    stats = overdue_checker.check_overdue_installments(full=True)
+
+    assert stats["processed"] == expected
+    with app_engine.connect() as connection:
+        assert count_overdue_candidates(connection, datetime.utcnow()) == 0
+        assert (
+            connection.scalar(
+                select(func.count())
+                .select_from(BuyerInstallment)
+                .where(BuyerInstallment.status == PaymentStatus.OVERDUE)
+            )
+            == expected
+        )
+        assert (
+            connection.scalar(select(func.count()).select_from(BalanceEntry))
+            == expected
+        )
+
+
+def test_incremental_run_picks_up_installments_created_since_last_run(
+    app_engine, monkeypatch
+):
+    seed_schedules(app_engine, horses=2, installments=12, buyers=2)
+    monkeypatch.setattr(overdue_checker, "OVERDUE_CHUNK_SIZE", 5)
+    overdue_checker.check_overdue_installments(full=True)
+
+    # Un comprador agregado después: cuotas ya vencidas pero creadas ahora
+    with app_engine.begin() as connection:
+        connection.execute(
+            insert(BuyerInstallment).from_select(
+                ["horse_buyer_id", "installment_id", "amount", "amount_paid", "status"],
+                select(
+                    literal(1),
+                    Installment.id,
+                    literal(1.0),
+                    literal(0.0),
+                    literal(PaymentStatus.PENDING.name),
+                ).where(
+                    Installment.horse_id == 2,
+                    Installment.due_date < datetime.utcnow(),
+                ),
+            )
+        )
+        added = count_overdue_candidates(connection, datetime.utcnow())
+    assert added > 0
+
+    stats = overdue_checker.check_overdue_installments()
+
+    assert stats["since"] is not None
+    assert stats["processed"] == added
+    with app_engine.connect() as connection:
+        assert count_overdue_candidates(connection, datetime.utcnow()) == 0
+
+
+def test_installment_paid_between_chunks_is_not_marked_overdue(app_engine, monkeypatch):
+    seed_schedules(app_engine, horses=2, installments=12, buyers=2)
+    monkeypatch.setattr(overdue_checker, "OVERDUE_CHUNK_SIZE", 3)
+    # Marca de avance antigua: la ventana incremental abarca todas las cuotas
+    with app_engine.begin() as connection:
+        connection.execute(
+            insert(JobCheckpoint).values(
+                name=overdue_checker.CHECKPOINT_NAME,
+                high_water_mark=datetime(2000, 1, 1),
+            )
+        )
+        expected = count_overdue_candidates(connection, datetime.utcnow())
+    assert expected > 3
+
+    mark_chunk_overdue = overdue_checker._mark_chunk_overdue
+    chunks, paid = [], []
+
+    def pay_before_second_chunk(db, ids):
+        chunks.append(ids)
+        if len(chunks) == 2:
+            # Pago registrado por otra solicitud después de leer los IDs
+            with app_engine.begin() as connection:
+                connection.execute(
+                    update(BuyerInstallment)
+                    .where(BuyerInstallment.id == ids[0])
+                    .values(
+                        amount_paid=BuyerInstallment.amount,
+                        status=PaymentStatus.PAID,
+                    )
+                )
+            paid.append(ids[0])
+        return mark_chunk_overdue(db, ids)
+
+    monkeypatch.setattr(overdue_checker, "_mark_chunk_overdue", pay_before_second_chunk)
+
+    overdue_checker.check_overdue_installments()
+
+    with app_engine.connect() as connection:
+        assert (
+            connection.scalar(
+                select(BuyerInstallment.status).where(BuyerInstallment.id == paid[0])
+            )
+            == PaymentStatus.PAID
+        )
+        assert (
+            connection.scalar(
+                select(func.count())
+                .select_from(BalanceEntry)
+                .where(BalanceEntry.buyer_installment_id == paid[0])
+            )
+            == 0
+        )
+        assert (
+            connection.scalar(select(func.count()).select_from(BalanceEntry))
+            == expected - 1
+        )
+        # El saldo de cada usuario sigue siendo la suma de su libro mayor
+        ledger = dict(
+            connection.execute(
+                select(BalanceEntry.user_id, func.sum(BalanceEntry.amount)).group_by(
+                    BalanceEntry.user_id
+                )
+            ).all()
+        )
+        for user_id, balance in connection.execute(select(User.id, User.balance)):
+            assert balance == pytest.approx(ledger.get(user_id, 0.0))
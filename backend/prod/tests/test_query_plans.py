@@ -0,0 +1,41 @@
+# backend/prod/tests/test_query_plans.py
+
+from api.crud import pending_amount_query
+from api.overdue_checker import incremental_overdue_query, overdue_chunk_query
+from conftest import NOW
+from datetime import timedelta
+
+
+def query_plan(engine, query) -> str:
+    """Detalle de EXPLAIN QUERY PLAN de `query`, una línea por paso."""
+    sql = query.compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def test_overdue_sweep_walks_status_index(seeded_engine):
+    plan = query_plan(seeded_engine, overdue_chunk_query(NOW))
+    assert "SCAN buyer_installments" not in plan
+    assert "ix_buyer_installments_status_id" in plan
+
+
+def test_overdue_sweep_resumes_after_last_id(seeded_engine):
+    plan = query_plan(seeded_engine, overdue_chunk_query(NOW, after_id=5000))
+    assert "ix_buyer_installments_status_id (status=? AND id>?)" in plan
+
+
+def test_pending_amount_uses_unpaid_index(seeded_engine):
+    plan = query_plan(seeded_engine, pending_amount_query(3))
+    assert "SCAN" not in plan
+    assert "ix_buyer_installments_unpaid" in plan
+
+
+def test_incremental_overdue_window_is_index_driven(seeded_engine):
+    plan = query_plan(
+        seeded_engine, incremental_overdue_query(NOW, NOW - timedelta(days=1))
+    )
+    assert "SCAN buyer_installments" not in plan
+    assert "SCAN installments" not in plan
+    assert "ix_installments_due_date" in plan
+    assert "ix_buyer_installments_created_at" in plan
@@ -0,0 +1,59 @@
+# backend/prod/tests/test_serialization.py
+
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from api import schemas, serialization
+from api.models import create_db_engine, metadata, User
+import json
+
+import pytest
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(serialization, "orjson", None)
+    return request.param
+
+
+def test_column_rows_match_pydantic_json(tmp_path, encoder):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'rows.db'}")
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User),
+            [
+                dict(
+                    name=name,
+                    email=f"u{i}@x.com",
+                    balance=balance,
+                    is_admin=False,
+                    created_at=datetime(2025, 3, 1, 8, 15, 0, 120000),
+                    updated_at=datetime(2025, 3, 1, 8, 15),
+                )
+                for i, (name, balance) in enumerate(
+                    [("Peña", -12.5), ("Ana", 0.0), ("José 😀", 0.1 + 0.2 - 0.3)]
+                )
+            ],
+        )
+
+    with Session(engine) as session:
+        rows = session.query(
+            *serialization.schema_columns(schemas.UserSchema, User)
+        ).order_by(User.id)
+        fast = serialization.dumps(serialization.schema_rows(rows, schemas.UserSchema))
+        users = session.query(User).order_by(User.id).all()
+        expected = json.dumps(
+            [
+                schemas.UserSchema.model_validate(user).model_dump(mode="json")
+                for user in users
+            ],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode()
+    engine.dispose()
+
+    assert fast == expected
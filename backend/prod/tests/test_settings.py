@@ -0,0 +1,45 @@
+# backend/prod/tests/test_settings.py
+
+from api import models, settings as settings_module
+from api.settings import Settings
+import logging
+import os
+
+
+def test_default_database_is_in_the_app_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    assert Settings().sqlalchemy_database_url == "sqlite:///" + os.path.join(
+        settings_module.BASE_DIR, "horses.db"
+    )
+
+
+def test_existing_database_in_the_working_directory_is_kept(
+    tmp_path, monkeypatch, caplog
+):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "horses.db").touch()
+
+    with caplog.at_level(logging.WARNING, logger=settings_module.__name__):
+        url = Settings().sqlalchemy_database_url
+
+    assert url == f"sqlite:///{tmp_path / 'horses.db'}"
+    assert "ubicación anterior" in caplog.text
+
+
+def test_foreign_key_violations_are_logged(app_engine, caplog):
+    with app_engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        connection.exec_driver_sql(
+            "INSERT INTO horse_buyers (horse_id, buyer_id, percentage) "
+            "VALUES (99, 98, 100)"
+        )
+        connection.commit()
+        connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+
+    with caplog.at_level(logging.ERROR, logger=models.__name__):
+        models.create_tables()
+
+    assert "1 filas de horse_buyers referencian filas inexistentes de horses" in (
+        caplog.text
+    )
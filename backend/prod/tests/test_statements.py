@@ -0,0 +1,51 @@
+# backend/prod/tests/test_statements.py
+
+from conftest import NOW, seed_schedules
+from datetime import datetime, timedelta
+import os
+import time
+
+from api import statements
+
+
+def test_statement_prints_the_installment_number(app_engine):
+    seed_schedules(app_engine, horses=2, installments=12, buyers=2)
+    # Cuarta cuota del plan (ver seed_schedules); su ID es 16 en el caballo 2
+    due_date = NOW + timedelta(days=30 * (3 - 6))
+
+    collected = statements._collect_statements(due_date.month, due_date.year)
+    statement = next(s for s in collected if s["horse_id"] == 2)
+    installment = statement["buyer"]["installments"][0]
+
+    assert (installment["installment_id"], installment["installment_number"]) == (
+        16,
+        4,
+    )
+    rows = [text for _, _, text in statements.statement_lines(statement)]
+    header = rows.index(f"{'Cuota':<8}{'Monto':>16}{'Pagado':>16}  Estado")
+    assert rows[header + 1].startswith("4       ")
+
+
+def test_cleanup_removes_expired_job_directories(tmp_path, monkeypatch):
+    monkeypatch.setattr(statements, "STATEMENTS_DIR", str(tmp_path))
+    monkeypatch.setattr(statements, "_jobs", {})
+    now = datetime.utcnow()
+    old = now - statements.STATEMENTS_TTL - timedelta(minutes=1)
+    jobs = {
+        "expired": dict(status="done", finished_at=old),
+        "recent": dict(status="failed", finished_at=now),
+        "running": dict(status="running", finished_at=None),
+    }
+    for job_id, job in jobs.items():
+        statements._jobs[job_id] = dict(job, id=job_id)
+        (tmp_path / job_id).mkdir()
+    # Directorios de ejecuciones anteriores del servidor, sin registro
+    for name in ("orphan_old", "orphan_new"):
+        (tmp_path / name).mkdir()
+    stale = time.time() - statements.STATEMENTS_TTL.total_seconds() - 60
+    for name in ("orphan_old", "running"):
+        os.utime(tmp_path / name, (stale, stale))
+
+    assert statements.cleanup_expired_jobs(now) == 2
+    assert sorted(os.listdir(tmp_path)) == ["orphan_new", "recent", "running"]
+    assert sorted(statements._jobs) == ["recent", "running"]